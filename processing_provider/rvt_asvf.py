@@ -25,12 +25,16 @@ class RVTASvf(QgsProcessingAlgorithm):
     RADIUS = "RADIUS"
     NUM_DIRECTIONS = "NUM_DIRECTIONS"
     NOISE_REMOVE = "NOISE_REMOVE"
+    SEARCH_MODE = "SEARCH_MODE"
     ANISOTROPY_LVL = "ANISOTROPY_LVL"
     ANISOTROPY_DIR = "ANISOTROPY_DIR"
     SAVE_AS_8BIT = "SAVE_AS_8BIT"
+    WORKERS = "WORKERS"
     OUTPUT = 'OUTPUT'
 
     noise_options = ["no removal", "low", "medium", "high"]
+    search_mode_options = ["shift (exact)", "pyramid (approximate, fast for long radius)",
+                           "sweep (exact, for long radius on large rasters)"]
     ani_lvl_options = ["low", "high"]
 
     def tr(self, string):
@@ -97,7 +101,7 @@ class RVTASvf(QgsProcessingAlgorithm):
                 type=QgsProcessingParameterNumber.Type.Integer,
                 defaultValue=10,
                 minValue=10,
-                maxValue=50
+                maxValue=2000
             )
         )
         self.addParameter(
@@ -118,6 +122,14 @@ class RVTASvf(QgsProcessingAlgorithm):
                 defaultValue="no removal"
             )
         )
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                name=self.SEARCH_MODE,
+                description="Horizon search method",
+                options=self.search_mode_options,
+                defaultValue=0
+            )
+        )
         self.addParameter(
             QgsProcessingParameterEnum(
                 name="ANISOTROPY_LVL",
@@ -143,6 +155,16 @@ class RVTASvf(QgsProcessingAlgorithm):
                 defaultValue=False
             )
         )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                name=self.WORKERS,
+                description="Number of threads",
+                type=QgsProcessingParameterNumber.Type.Integer,
+                defaultValue=1,
+                minValue=1,
+                maxValue=256
+            )
+        )
         self.addParameter(
             QgsProcessingParameterRasterDestination(
                 self.OUTPUT,
@@ -180,6 +202,11 @@ class RVTASvf(QgsProcessingAlgorithm):
             self.NOISE_REMOVE,
             context
         ))
+        search_mode = ["shift", "pyramid", "sweep"][int(self.parameterAsEnum(
+            parameters,
+            self.SEARCH_MODE,
+            context
+        ))]
         asvf_lvl = int(self.parameterAsEnum(
             parameters,
             self.ANISOTROPY_LVL,
@@ -196,6 +223,11 @@ class RVTASvf(QgsProcessingAlgorithm):
             self.SAVE_AS_8BIT,
             context
         ))
+        workers = int(self.parameterAsInt(
+            parameters,
+            self.WORKERS,
+            context
+        ))
         visualization_path = (self.parameterAsOutputLayer(
             parameters,
             self.OUTPUT,
@@ -212,7 +244,9 @@ class RVTASvf(QgsProcessingAlgorithm):
         visualization_arr = rvt.vis.sky_view_factor(dem=dem_arr, resolution=resolution[0], compute_svf=False,
                                                     compute_asvf=True, compute_opns=False, svf_n_dir=nr_dir,
                                                     svf_r_max=radius, svf_noise=noise, ve_factor=ve_factor,
-                                                    asvf_level=asvf_lvl, asvf_dir=asvf_dir, no_data=no_data)["asvf"]
+                                                    asvf_level=asvf_lvl, asvf_dir=asvf_dir, no_data=no_data,
+                                                    workers=workers,
+                                                    search_mode=search_mode)["asvf"]
         if not save_8bit:
             rvt.default.save_raster(src_raster_path=dem_path, out_raster_path=visualization_path,
                                     out_raster_arr=visualization_arr, e_type=6, no_data=np.nan)
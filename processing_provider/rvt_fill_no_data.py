@@ -5,7 +5,8 @@ from qgis.core import (
     QgsProcessingParameterRasterLayer,
     QgsProcessingParameterNumber,
     QgsProcessingParameterRasterDestination,
-    QgsProcessingParameterEnum
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterBoolean
                        )
 from qgis import processing
 import numpy as np
@@ -22,9 +23,11 @@ class RVTFillNoData(QgsProcessingAlgorithm):
     # processing function parameters
     INPUT = 'INPUT'
     METHOD = 'METHOD'
+    BY_REGION = 'BY_REGION'
+    MAX_HOLE_SIZE = 'MAX_HOLE_SIZE'
     OUTPUT = 'OUTPUT'
 
-    method_options = ["kd_tree", "nearest_neighbour"]
+    method_options = ["kd_tree", "nearest_neighbour", "push_pull"]
 
     def tr(self, string):
         """
@@ -80,6 +83,22 @@ class RVTFillNoData(QgsProcessingAlgorithm):
                 defaultValue="nearest_neighbour"
             )
         )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                name=self.BY_REGION,
+                description="Fill each void from its rim pixels (not for push_pull)",
+                defaultValue=False
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                name=self.MAX_HOLE_SIZE,
+                description="Max void size to fill by region [pixels] (0 - no limit)",
+                type=QgsProcessingParameterNumber.Type.Integer,
+                defaultValue=0,
+                minValue=0
+            )
+        )
         self.addParameter(
             QgsProcessingParameterRasterDestination(
                 self.OUTPUT,
@@ -102,6 +121,16 @@ class RVTFillNoData(QgsProcessingAlgorithm):
             context
         ))
         method = self.method_options[method_enum]
+        by_region = bool(self.parameterAsBool(
+            parameters,
+            self.BY_REGION,
+            context
+        ))
+        max_hole_size = int(self.parameterAsInt(
+            parameters,
+            self.MAX_HOLE_SIZE,
+            context
+        ))
         dem_out_path = (self.parameterAsOutputLayer(
             parameters,
             self.OUTPUT,
@@ -117,7 +146,8 @@ class RVTFillNoData(QgsProcessingAlgorithm):
 
         dem_arr[dem_arr == no_data] = np.nan
 
-        dem_out = rvt.vis.fill_where_nan(dem=dem_arr, method=method)
+        dem_out = rvt.vis.fill_where_nan(dem=dem_arr, method=method, by_region=by_region,
+                                         max_hole_size=max_hole_size if max_hole_size > 0 else None)
         rvt.default.save_raster(src_raster_path=dem_path, out_raster_path=dem_out_path,
                                 out_raster_arr=dem_out, e_type=6, no_data=np.nan)
 
@@ -133,6 +163,8 @@ class RVTFillNoDataIDW(QgsProcessingAlgorithm):
     INPUT = 'INPUT'
     RADIUS = 'RADIUS'
     POWER = 'POWER'
+    BY_REGION = 'BY_REGION'
+    MAX_HOLE_SIZE = 'MAX_HOLE_SIZE'
     OUTPUT = 'OUTPUT'
 
     def tr(self, string):
@@ -201,6 +233,22 @@ class RVTFillNoDataIDW(QgsProcessingAlgorithm):
                 maxValue=10
             )
         )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                name=self.BY_REGION,
+                description="Fill each void from its rim pixels (search radius is not used)",
+                defaultValue=False
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                name=self.MAX_HOLE_SIZE,
+                description="Max void size to fill by region [pixels] (0 - no limit)",
+                type=QgsProcessingParameterNumber.Type.Integer,
+                defaultValue=0,
+                minValue=0
+            )
+        )
         self.addParameter(
             QgsProcessingParameterRasterDestination(
                 self.OUTPUT,
@@ -227,6 +275,16 @@ class RVTFillNoDataIDW(QgsProcessingAlgorithm):
             self.POWER,
             context
         ))
+        by_region = bool(self.parameterAsBool(
+            parameters,
+            self.BY_REGION,
+            context
+        ))
+        max_hole_size = int(self.parameterAsInt(
+            parameters,
+            self.MAX_HOLE_SIZE,
+            context
+        ))
         dem_out_path = (self.parameterAsOutputLayer(
             parameters,
             self.OUTPUT,
@@ -242,7 +300,8 @@ class RVTFillNoDataIDW(QgsProcessingAlgorithm):
 
         dem_arr[dem_arr == no_data] = np.nan
 
-        dem_out = rvt.vis.fill_where_nan(dem=dem_arr, method=f"idw_{radius}_{power}")
+        dem_out = rvt.vis.fill_where_nan(dem=dem_arr, method=f"idw_{radius}_{power}", by_region=by_region,
+                                         max_hole_size=max_hole_size if max_hole_size > 0 else None)
         rvt.default.save_raster(src_raster_path=dem_path, out_raster_path=dem_out_path,
                                 out_raster_arr=dem_out, e_type=6, no_data=np.nan)
 
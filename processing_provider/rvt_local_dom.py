@@ -27,6 +27,7 @@ class RVTLocalDom(QgsProcessingAlgorithm):
     ANGULAR_RES = "ANGULAR_RES"
     OBSERVER_H = "OBSERVER_H"
     SAVE_AS_8BIT = "SAVE_AS_8BIT"
+    WORKERS = "WORKERS"
     OUTPUT = 'OUTPUT'
 
     def tr(self, string):
@@ -132,6 +133,16 @@ class RVTLocalDom(QgsProcessingAlgorithm):
                 defaultValue=False
             )
         )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                name=self.WORKERS,
+                description="Number of threads",
+                type=QgsProcessingParameterNumber.Type.Integer,
+                defaultValue=1,
+                minValue=1,
+                maxValue=256
+            )
+        )
         self.addParameter(
             QgsProcessingParameterRasterDestination(
                 self.OUTPUT,
@@ -179,6 +190,11 @@ class RVTLocalDom(QgsProcessingAlgorithm):
             self.SAVE_AS_8BIT,
             context
         ))
+        workers = int(self.parameterAsInt(
+            parameters,
+            self.WORKERS,
+            context
+        ))
         visualization_path = (self.parameterAsOutputLayer(
             parameters,
             self.OUTPUT,
@@ -194,7 +210,7 @@ class RVTLocalDom(QgsProcessingAlgorithm):
 
         visualization_arr = rvt.vis.local_dominance(dem=dem_arr, min_rad=min_rad, max_rad=max_rad,
                                                     angular_res=angular_res, observer_height=observer_h,
-                                                    ve_factor=ve_factor, no_data=no_data)
+                                                    ve_factor=ve_factor, no_data=no_data, workers=workers)
         if not save_8bit:
             rvt.default.save_raster(src_raster_path=dem_path, out_raster_path=visualization_path,
                                     out_raster_arr=visualization_arr, e_type=6, no_data=np.nan)
@@ -32,6 +32,7 @@ class RVTMstp(QgsProcessingAlgorithm):
     BROAD_SCALE_MAX = "BROAD_SCALE_MAX"
     BROAD_SCALE_STEP = "BROAD_SCALE_STEP"
     LIGHTNESS = "LIGHTNESS"
+    MULTI_RESOLUTION = "MULTI_RESOLUTION"
     SAVE_AS_8BIT = "SAVE_AS_8BIT"
     OUTPUT = 'OUTPUT'
 
@@ -194,6 +195,13 @@ class RVTMstp(QgsProcessingAlgorithm):
                 maxValue=5.0
             )
         )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                name="MULTI_RESOLUTION",
+                description="Compute meso and broad scale on decimated DEM (faster, approximate)",
+                defaultValue=False
+            )
+        )
         self.addParameter(
             QgsProcessingParameterBoolean(
                 name="SAVE_AS_8BIT",
@@ -272,6 +280,11 @@ class RVTMstp(QgsProcessingAlgorithm):
             self.LIGHTNESS,
             context
         ))
+        multi_resolution = bool(self.parameterAsBool(
+            parameters,
+            self.MULTI_RESOLUTION,
+            context
+        ))
         save_8bit = bool(self.parameterAsBool(
             parameters,
             self.SAVE_AS_8BIT,
@@ -295,7 +308,7 @@ class RVTMstp(QgsProcessingAlgorithm):
                                          meso_scale=(meso_scale_min, meso_scale_max, meso_scale_step),
                                          broad_scale=(broad_scale_min, broad_scale_max, broad_scale_step),
                                          lightness=lightness, ve_factor=ve_factor,
-                                         no_data=no_data)
+                                         no_data=no_data, multi_resolution=multi_resolution)
         if not save_8bit:
             rvt.default.save_raster(src_raster_path=dem_path, out_raster_path=visualization_path,
                                     out_raster_arr=visualization_arr, e_type=6, no_data=np.nan)
@@ -25,11 +25,15 @@ class RVTOpns(QgsProcessingAlgorithm):
     RADIUS = "RADIUS"
     NUM_DIRECTIONS = "NUM_DIRECTIONS"
     NOISE_REMOVE = "NOISE_REMOVE"
+    SEARCH_MODE = "SEARCH_MODE"
     OPNS_TYPE = "OPNS_TYPE"
     SAVE_AS_8BIT = "SAVE_AS_8BIT"
+    WORKERS = "WORKERS"
     OUTPUT = 'OUTPUT'
 
     noise_options = ["no removal", "low", "medium", "high"]
+    search_mode_options = ["shift (exact)", "pyramid (approximate, fast for long radius)",
+                           "sweep (exact, for long radius on large rasters)"]
     opns_options = ["Positive", "Negative"]
 
     def tr(self, string):
@@ -95,7 +99,7 @@ class RVTOpns(QgsProcessingAlgorithm):
                 type=QgsProcessingParameterNumber.Type.Integer,
                 defaultValue=10,
                 minValue=10,
-                maxValue=50
+                maxValue=2000
             )
         )
         self.addParameter(
@@ -116,6 +120,14 @@ class RVTOpns(QgsProcessingAlgorithm):
                 defaultValue="no removal"
             )
         )
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                name=self.SEARCH_MODE,
+                description="Horizon search method",
+                options=self.search_mode_options,
+                defaultValue=0
+            )
+        )
         self.addParameter(
             QgsProcessingParameterEnum(
                 name="OPNS_TYPE",
@@ -131,6 +143,16 @@ class RVTOpns(QgsProcessingAlgorithm):
                 defaultValue=False
             )
         )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                name=self.WORKERS,
+                description="Number of threads",
+                type=QgsProcessingParameterNumber.Type.Integer,
+                defaultValue=1,
+                minValue=1,
+                maxValue=256
+            )
+        )
         self.addParameter(
             QgsProcessingParameterRasterDestination(
                 self.OUTPUT,
@@ -168,6 +190,11 @@ class RVTOpns(QgsProcessingAlgorithm):
             self.NOISE_REMOVE,
             context
         ))
+        search_mode = ["shift", "pyramid", "sweep"][int(self.parameterAsEnum(
+            parameters,
+            self.SEARCH_MODE,
+            context
+        ))]
         opns_type = int(self.parameterAsEnum(
             parameters,
             self.OPNS_TYPE,
@@ -178,6 +205,11 @@ class RVTOpns(QgsProcessingAlgorithm):
             self.SAVE_AS_8BIT,
             context
         ))
+        workers = int(self.parameterAsInt(
+            parameters,
+            self.WORKERS,
+            context
+        ))
         visualization_path = (self.parameterAsOutputLayer(
             parameters,
             self.OUTPUT,
@@ -192,13 +224,16 @@ class RVTOpns(QgsProcessingAlgorithm):
         no_data = dict_arr_dem["no_data"]
 
         vis = RVTVisualization.POSITIVE_OPENNESS
+        opns_key = "opns"
         if opns_type == 1:
             vis = RVTVisualization.NEGATIVE_OPENNESS
-            dem_arr = dem_arr * -1  # negative openness is openness where dem * -1
+            opns_key = "neg_opns"
         visualization_arr = rvt.vis.sky_view_factor(dem=dem_arr, resolution=resolution[0], compute_svf=False,
-                                                    compute_asvf=False, compute_opns=True, svf_n_dir=nr_dir,
+                                                    compute_asvf=False, compute_opns=opns_type == 0,
+                                                    compute_neg_opns=opns_type == 1, svf_n_dir=nr_dir,
                                                     svf_r_max=radius, svf_noise=noise, ve_factor=ve_factor,
-                                                    no_data=no_data)["opns"]
+                                                    no_data=no_data, workers=workers,
+                                                    search_mode=search_mode)[opns_key]
         if not save_8bit:
             rvt.default.save_raster(src_raster_path=dem_path, out_raster_path=visualization_path,
                                     out_raster_arr=visualization_arr, e_type=6, no_data=np.nan)
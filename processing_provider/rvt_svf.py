@@ -25,10 +25,14 @@ class RVTSvf(QgsProcessingAlgorithm):
     RADIUS = "RADIUS"
     NUM_DIRECTIONS = "NUM_DIRECTIONS"
     NOISE_REMOVE = "NOISE_REMOVE"
+    SEARCH_MODE = "SEARCH_MODE"
     SAVE_AS_8BIT = "SAVE_AS_8BIT"
+    WORKERS = "WORKERS"
     OUTPUT = 'OUTPUT'
 
     noise_options = ["no removal", "low", "medium", "high"]
+    search_mode_options = ["shift (exact)", "pyramid (approximate, fast for long radius)",
+                           "sweep (exact, for long radius on large rasters)"]
 
     def tr(self, string):
         """
@@ -93,7 +97,7 @@ class RVTSvf(QgsProcessingAlgorithm):
                 type=QgsProcessingParameterNumber.Type.Integer,
                 defaultValue=10,
                 minValue=10,
-                maxValue=50
+                maxValue=2000
             )
         )
         self.addParameter(
@@ -114,6 +118,14 @@ class RVTSvf(QgsProcessingAlgorithm):
                 defaultValue="no removal"
             )
         )
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                name=self.SEARCH_MODE,
+                description="Horizon search method",
+                options=self.search_mode_options,
+                defaultValue=0
+            )
+        )
         self.addParameter(
             QgsProcessingParameterBoolean(
                 name="SAVE_AS_8BIT",
@@ -121,6 +133,16 @@ class RVTSvf(QgsProcessingAlgorithm):
                 defaultValue=False
             )
         )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                name=self.WORKERS,
+                description="Number of threads",
+                type=QgsProcessingParameterNumber.Type.Integer,
+                defaultValue=1,
+                minValue=1,
+                maxValue=256
+            )
+        )
         self.addParameter(
             QgsProcessingParameterRasterDestination(
                 self.OUTPUT,
@@ -158,11 +180,21 @@ class RVTSvf(QgsProcessingAlgorithm):
             self.NOISE_REMOVE,
             context
         ))
+        search_mode = ["shift", "pyramid", "sweep"][int(self.parameterAsEnum(
+            parameters,
+            self.SEARCH_MODE,
+            context
+        ))]
         save_8bit = bool(self.parameterAsBool(
             parameters,
             self.SAVE_AS_8BIT,
             context
         ))
+        workers = int(self.parameterAsInt(
+            parameters,
+            self.WORKERS,
+            context
+        ))
         visualization_path = (self.parameterAsOutputLayer(
             parameters,
             self.OUTPUT,
@@ -179,7 +211,8 @@ class RVTSvf(QgsProcessingAlgorithm):
         visualization_arr = rvt.vis.sky_view_factor(dem=dem_arr, resolution=resolution[0], compute_svf=True,
                                                     compute_asvf=False, compute_opns=False, svf_n_dir=nr_dir,
                                                     svf_r_max=radius, svf_noise=noise, ve_factor=ve_factor,
-                                                    no_data=no_data)["svf"]
+                                                    no_data=no_data, workers=workers,
+                                                    search_mode=search_mode)["svf"]
         if not save_8bit:
             rvt.default.save_raster(src_raster_path=dem_path, out_raster_path=visualization_path,
                                     out_raster_arr=visualization_arr, e_type=6, no_data=np.nan)
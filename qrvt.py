@@ -747,6 +747,7 @@ class QRVT:
 
     def check_fill_no_data_other_fill_method_combo_change(self):
         self.dlg.combo_fill_method.currentTextChanged.connect(lambda: self.fill_no_data_other_fill_method_combo_check())
+        self.dlg.check_fill_by_region.stateChanged.connect(lambda: self.fill_no_data_other_fill_method_combo_check())
 
     def fill_no_data_other_fill_method_combo_check(self):
         """Fill no data method additional parameters checks."""
@@ -760,6 +761,14 @@ class QRVT:
             self.dlg.line_fill_nan_rad.setEnabled(False)
             self.dlg.label_fill_nan_scl.setEnabled(False)
             self.dlg.line_fill_nan_scl.setEnabled(False)
+        # push-pull fills whole dem at once (not by region)
+        if self.dlg.combo_fill_method.currentText() == "Push-Pull":
+            self.dlg.check_fill_by_region.setChecked(False)
+            self.dlg.check_fill_by_region.setEnabled(False)
+        else:
+            self.dlg.check_fill_by_region.setEnabled(True)
+        self.dlg.label_fill_max_hole.setEnabled(self.dlg.check_fill_by_region.isChecked())
+        self.dlg.line_fill_max_hole.setEnabled(self.dlg.check_fill_by_region.isChecked())
 
     def check_blender_checkbox_float_8bit_change(self):
         self.dlg.check_blender_save_float.stateChanged.connect(lambda: self.blender_checkbox_float_8bit_check())
@@ -1139,6 +1148,10 @@ class QRVT:
             return "Nearest Neighbour"
         elif fill_method == "Nearest Neighbour":
             return "nearest_neighbour"
+        elif fill_method == "push_pull":
+            return "Push-Pull"
+        elif fill_method == "Push-Pull":
+            return "push_pull"
 
     def load_default2dlg(self):
         """Reads default (rvt.default.DefaultValues()) from default_path and fill visualization dlg."""
@@ -2201,9 +2214,16 @@ class QRVT:
             out_raster_name += ".tif"
             out_raster_path = os.path.join(save_dir, out_raster_name)
 
+            by_region = self.dlg.check_fill_by_region.isChecked()
+            try:
+                max_hole_size = int(self.dlg.line_fill_max_hole.text())
+            except:
+                max_hole_size = 0
+
             raster_arr[raster_arr == raster_no_data] = np.nan
             raster_arr = rvt.vis.fill_where_nan(
-                raster_arr, self.fill_method_translate(self.dlg.combo_fill_method.currentText()))
+                raster_arr, self.fill_method_translate(self.dlg.combo_fill_method.currentText()),
+                by_region=by_region, max_hole_size=max_hole_size if max_hole_size > 0 else None)
 
             rvt.default.save_raster(src_raster_path=raster_path, out_raster_path=out_raster_path,
                                     out_raster_arr=raster_arr, no_data=np.nan, e_type=6)
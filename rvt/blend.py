@@ -462,19 +462,10 @@ class BlenderCombination:
                         norm_image = normalize_image(visualization, norm_image,
                                                      min_norm, max_norm, normalization)
                     else:
-                        red_band_arr = rvt.vis.hillshade(dem=self.dem_arr, resolution_x=self.dem_resolution,
-                                                         resolution_y=self.dem_resolution,
-                                                         sun_elevation=default.mhs_sun_el, sun_azimuth=315,
-                                                         no_data=no_data)
-                        green_band_arr = rvt.vis.hillshade(dem=self.dem_arr, resolution_x=self.dem_resolution,
-                                                           resolution_y=self.dem_resolution,
-                                                           sun_elevation=default.mhs_sun_el, sun_azimuth=22.5,
-                                                           no_data=no_data)
-                        blue_band_arr = rvt.vis.hillshade(dem=self.dem_arr, resolution_x=self.dem_resolution,
-                                                          resolution_y=self.dem_resolution,
-                                                          sun_elevation=default.mhs_sun_el, sun_azimuth=90,
-                                                          no_data=no_data)
-                        image = np.array([red_band_arr, green_band_arr, blue_band_arr])
+                        image = rvt.vis.multi_hillshade(dem=self.dem_arr, resolution_x=self.dem_resolution,
+                                                        resolution_y=self.dem_resolution,
+                                                        sun_elevation=default.mhs_sun_el,
+                                                        sun_azimuths=[315, 22.5, 90], no_data=no_data)
                         norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
                 elif self.layers[i_img].vis.lower() == "simple local relief model":
                     if save_visualizations:
@@ -1285,14 +1276,13 @@ def color_relief_image_map(dem, resolution, default: rvt.default.DefaultValues =
     default.svf_r_max = 10
 
     if no_data is not None:
-        dem[dem == no_data] = np.nan
-
-    opns_pos_arr = default.get_sky_view_factor(dem_arr=dem, resolution=resolution,
-                                               compute_svf=False, compute_asvf=False, compute_opns=True,
-                                               no_data=None)["opns"]
-    opns_neg_arr = default.get_sky_view_factor(dem_arr=-1 * dem, resolution=resolution,
-                                               compute_svf=False, compute_asvf=False, compute_opns=True,
-                                               no_data=None)["opns"]
+        dem = np.where(dem == no_data, np.nan, dem)
+
+    dict_opns = default.get_sky_view_factor(dem_arr=dem, resolution=resolution,
+                                            compute_svf=False, compute_asvf=False, compute_opns=True,
+                                            no_data=None, compute_neg_opns=True)
+    opns_pos_arr = dict_opns["opns"]
+    opns_neg_arr = dict_opns["neg_opns"]
     opns_pos_neg_arr = opns_pos_arr - opns_neg_arr
 
     slope_arr = rvt.vis.slope_aspect(
@@ -1343,7 +1333,7 @@ def e3mstp(dem, resolution, default: rvt.default.DefaultValues = rvt.default.Def
         2D numpy result array of Color relief image map.
     """
     if no_data is not None:
-        dem[dem == no_data] = np.nan
+        dem = np.where(dem == no_data, np.nan, dem)
     slrm_arr = default.get_slrm(dem_arr=dem)
     crim_red_arr = color_relief_image_map(dem=dem, resolution=resolution, default=default,
                                           colormap="OrRd", min_colormap_cut=0, max_colormap_cut=1)
@@ -1404,15 +1394,16 @@ def e4mstp(dem, resolution, default: rvt.default.DefaultValues=rvt.default.Defau
 
     # Nodata check
     if no_data is not None:
-        dem[dem == no_data] = np.nan
+        dem = np.where(dem == no_data, np.nan, dem)
 
     # Calculate intermediate visualisations:
     # ------------------------------------------------------------------------------------------------------------------
     ld_arr = default.get_local_dominance(dem).squeeze()
-    svf_temp = default.get_sky_view_factor(dem, resolution, compute_svf=True, compute_opns=True)
+    svf_temp = default.get_sky_view_factor(dem, resolution, compute_svf=True, compute_opns=True,
+                                           compute_neg_opns=True)
     opns_arr = svf_temp["opns"].squeeze()
     svf_arr = svf_temp["svf"].squeeze()
-    neg_opns_arr = default.get_neg_opns(dem, resolution).squeeze()
+    neg_opns_arr = svf_temp["neg_opns"].squeeze()
 
     # SVF for flat terrain (settings hardcoded, instead of importing second defaults.json)
     default_2 = rvt.default.DefaultValues()
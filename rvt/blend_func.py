@@ -458,6 +458,51 @@ def normalize_image(visualization, image, min_norm, max_norm, normalization):
     return norm_image
 
 
+def normalize_image_8bit(visualization, image, min_norm, max_norm, normalization, out=None):
+    """Fused normalize_image and byte scale (rvt.vis.byte_scale with c_min=0, c_max=1) of float visualization to
+    8bit (uint8), gives the same result. Cut-off, stretch, invert (for slope and negative openness), scale and no data
+    (np.nan is 255) are computed in place on one float buffer, image is not changed. Result is stored in out if given.
+    """
+    if normalization == "percent":
+        normalization = "perc"
+
+    # cut-off values (same as advanced_normalization)
+    if normalization.lower() == "value":
+        if min_norm == max_norm:
+            raise Exception("rvt.blend_func.normalize_image_8bit: If normalization == value, min and max cannot be"
+                            " the same!")
+        if min_norm > max_norm:
+            raise Exception("rvt.blend_func.normalize_image_8bit: If normalization == value, max can't be smaller"
+                            " than min!")
+        min_lin = min_norm
+        max_lin = max_norm
+    elif normalization.lower() == "perc":
+        min_max_lin_dict = lin_cutoff_calc_from_perc(image, min_norm, max_norm)
+        min_lin = min_max_lin_dict["min_lin"]
+        max_lin = min_max_lin_dict["max_lin"]
+    else:
+        raise Exception(f"rvt.blend_func.normalize_image_8bit: Unknown normalization type: {normalization}")
+
+    # linear stretch to 0.0 - 1.0 interval (same as normalize_lin)
+    norm_image = np.subtract(image, min_lin, dtype=np.result_type(image, min_lin, max_lin))
+    norm_image /= max_lin - min_lin
+    np.clip(norm_image, 0, 1, out=norm_image)
+    norm_image = norm_image.astype(np.float32, copy=False)
+
+    # For slope invert scale (high slopes will be black)
+    if visualization.lower() == "slope gradient" or visualization.lower() == "openness - negative" or \
+            visualization == "slp" or visualization == "neg_opns":
+        np.subtract(1, norm_image, out=norm_image)
+
+    # byte scale, copied from IDL BYTSCL
+    norm_image *= 255.9999
+    np.nan_to_num(norm_image, copy=False, nan=255)  # change no_data to 255
+    if out is None:
+        out = np.empty(norm_image.shape, dtype=np.uint8)
+    np.copyto(out, norm_image, casting="unsafe")
+    return out
+
+
 def cut_off_normalize(image, mode, cutoff_min=None, cutoff_max=None, bool_norm=True):
     """
     One band image cut-off or normalization or both. Image is 2D np.ndarray of raster, mode is perc or value
@@ -21,9 +21,12 @@ Copyright:
 """
 
 import warnings
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
 from enum import Enum
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 import rvt.vis
 import rvt.blend_func
@@ -52,6 +55,63 @@ class RVTVisualization(Enum):
     MULTI_SCALE_TOPOGRAPHIC_POSITION = "mstp"
 
 
+class DerivativeCache:
+    """
+    Cache of slope and aspect (in radians) shared by visualizations computed from the same DEM array (slope, hillshade,
+    multi-hillshade, sky illumination), so gradients are computed once. Entries are keyed by DEM array identity (weak
+    reference, entry is invalid when the array is gone), resolution, ve_factor and no_data. Least recently used entries
+    are dropped when cached arrays exceed max_bytes. Cache also keeps the last DEM read from a file (get_raster_arr),
+    so visualizations saved in one run share the DEM array.
+
+    Attributes
+    ----------
+    max_bytes : int
+        Memory cap for cached slope and aspect arrays in bytes.
+    """
+
+    def __init__(self, max_bytes=2 ** 30):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._raster = None  # (raster_path, get_raster_arr output)
+
+    @property
+    def nbytes(self):
+        return sum(slope.nbytes + aspect.nbytes for _, slope, aspect in self._entries.values())
+
+    def clear(self):
+        self._entries.clear()
+        self._raster = None
+
+    def get_raster_arr(self, raster_path):
+        """Returns get_raster_arr(raster_path), raster is read only once. Returned array is shared and read-only
+        (visualization functions change no_data to np.nan on a copy)."""
+        if self._raster is None or self._raster[0] != raster_path:
+            dict_arr = get_raster_arr(raster_path=raster_path)
+            dict_arr["array"].setflags(write=False)
+            self._raster = (raster_path, dict_arr)
+        return self._raster[1]
+
+    def get_slope_aspect(self, dem_arr, resolution_x, resolution_y, ve_factor=1, no_data=None):
+        """Returns {"slope": slope, "aspect": aspect} in radians (rvt.vis.slope_aspect), computed once per key.
+        Returned arrays are shared, don't change them."""
+        key = (id(dem_arr), resolution_x, resolution_y, ve_factor, no_data)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0]() is dem_arr:
+            self._entries.move_to_end(key)
+            return {"slope": entry[1], "aspect": entry[2]}
+        dict_slp_asp = rvt.vis.slope_aspect(dem=dem_arr, resolution_x=resolution_x, resolution_y=resolution_y,
+                                            output_units="radian", ve_factor=ve_factor, no_data=no_data)
+        self._entries[key] = (weakref.ref(dem_arr), dict_slp_asp["slope"], dict_slp_asp["aspect"])
+        # drop entries of released arrays, then least recently used
+        for old_key in [k for k, (dem_ref, _, _) in self._entries.items() if dem_ref() is None]:
+            del self._entries[old_key]
+        while len(self._entries) > 1 and self.nbytes > self.max_bytes:
+            self._entries.popitem(last=False)
+        if self.nbytes > self.max_bytes:
+            self._entries.clear()
+        return dict_slp_asp
+
+
 class DefaultValues:
     """
     Class which define layer for blending. BlenderLayer is basic element in BlenderCombination.layers list.
@@ -93,6 +153,10 @@ class DefaultValues:
     svf_noise : int
         Sky-View Factor (Anisotropic Sky-View Factor, Openness). The level of noise remove [0-don't remove, 1-low, 2-med
         , 3-high].
+    svf_search_mode : str
+        Sky-View Factor (Anisotropic Sky-View Factor, Openness). Horizon search method ['shift' - exact,
+        'pyramid' - approximate, fast for long search radii, 'sweep' - exact along digital lines, cost independent of
+        search radius].
     asvf_compute : bool
         If compute Anisotropic Sky-View Factor. Parameter for GUIs.
     asvf_dir : int
@@ -153,6 +217,9 @@ class DefaultValues:
         All have to be integers!
     mstp_lightness : float
         Lightness of image.
+    mstp_multi_resolution : bool
+        Multi-scale topographic position. If 1 (True) meso and broad scale are computed on decimated DEM (faster,
+        approximate), if 0 (False) on the full resolution.
     slp_save_float : bool
         Slope. If 1 (True) it saves float, if 0 (False) it doesn't.
     hs_save_float : bool
@@ -222,13 +289,41 @@ class DefaultValues:
     msrm_bytscl : tuple(mode, min, max)
         Multi-scale relief model, linear stretch, bytescale (0-255) for 8bit raster. Mode can be 'value' or 'percent'
         (cut-off units). Values min and max define stretch borders (in mode units).
+    workers : int
+        Number of threads used by visualizations that split their computation by search directions (Sky-View Factor,
+        Anisotropic Sky-View Factor, Openness) or by bands of lines (Local dominance). Results don't depend on the
+        number of workers.
     tile_size_limit : int
         If array size bigger than tile_size_limit it uses saving tile by tile (rvt.tile module).
     tile_size : tuple(x_size, y_size)
         Size of single tile when saving tile by tile.
+    tile_workers : int
+        Number of processes computing tiles in parallel when saving tile by tile, 1 computes tiles one after another
+        in the current process. Each process uses its own workers threads.
+    tile_max_in_flight : int
+        Maximal number of tiles computed or waiting to be written at once (bounds memory) when tile_workers > 1. If
+        None it is 2 * tile_workers.
+    tile_block_size : int
+        Block size (multiple of 16) of tiled GTiffs saved tile by tile. Tile size is rounded up to a multiple of it.
+    tile_compress : str
+        Compression of rasters saved tile by tile, 'ZSTD', 'DEFLATE', 'LZW' or 'NONE' (used with predictor).
+    tile_compress_threads : int or str
+        Number of threads compressing rasters saved tile by tile, 'ALL_CPUS' for all.
+    tile_auto : int
+        If 1, memory cost model (rvt.tile.estimate_rvt_visualizations_memory) decides between computing in memory and
+        tile by tile and chooses tile size (tile_size_limit and tile_size are used only if available memory is
+        unknown). If 0, tile_size_limit and tile_size are used.
+    memory_limit : int
+        Memory (in bytes) available for computation when tile_auto=1, if None it is memory_fraction of available
+        system memory.
+    memory_fraction : float
+        Fraction of available system memory used for computation when tile_auto=1 and memory_limit is None.
+    derivative_cache : DerivativeCache
+        Slope and aspect cache used by get_* methods, None (no caching) outside of cache_derivatives context.
     """
 
     def __init__(self):
+        self.derivative_cache = None
         self.overwrite = 0  # (0=False, 1=True)
         self.ve_factor = 1
         # slope gradient
@@ -251,6 +346,7 @@ class DefaultValues:
         self.svf_n_dir = 16
         self.svf_r_max = 10
         self.svf_noise = 0
+        self.svf_search_mode = "shift"
         # anisotropic sky-view factor
         self.asvf_compute = 0
         self.asvf_dir = 315
@@ -285,6 +381,7 @@ class DefaultValues:
         self.mstp_meso_scale = (5, 50, 5)
         self.mstp_broad_scale = (50, 500, 50)
         self.mstp_lightness = 0.9
+        self.mstp_multi_resolution = 0
         # save float
         self.slp_save_float = 1
         self.hs_save_float = 1
@@ -320,9 +417,19 @@ class DefaultValues:
         self.ld_bytscl = ("value", 0.50, 1.80)
         self.msrm_bytscl = ("value", -2.50, 2.50)
         self.mstp_bytscl = ("value", 0.00, 1.00)
+        # parallel computation
+        self.workers = 1  # number of threads
         # tile
         self.tile_size_limit = 10000 * 10000  # if arr size > tile_size limit, it uses tile module
         self.tile_size = (4000, 4000)  # size of single tile when using tile module (x_size, y_size)
+        self.tile_workers = 1  # number of processes computing tiles
+        self.tile_max_in_flight = None  # max number of tiles in computation or waiting for write, None is 2 * workers
+        self.tile_block_size = 512  # block size of tiled GTiffs saved tile by tile
+        self.tile_compress = "DEFLATE"  # compression of rasters saved tile by tile (ZSTD, DEFLATE, LZW, NONE)
+        self.tile_compress_threads = "ALL_CPUS"  # number of threads compressing rasters saved tile by tile
+        self.tile_auto = 0  # memory cost model decides tile by tile and tile size (0=False, 1=True)
+        self.memory_limit = None  # memory for computation (bytes) when tile_auto, None is memory_fraction of available
+        self.memory_fraction = 0.8  # fraction of available system memory used when tile_auto and memory_limit is None
 
     def save_default_to_file(self, file_path=None):
         """Saves default attributes into .json file."""
@@ -334,6 +441,10 @@ class DefaultValues:
             "ve_factor": {
                 "value": self.ve_factor,
                 "description": "Vertical exaggeration."},
+            "workers": {
+                "value": self.workers,
+                "description": "Number of threads used by Sky-View Factor, Anisotropic Sky-View Factor, Openness "
+                               "and Local dominance. Results don't depend on it."},
             "Hillshade": {
                 "hs_compute": {"value": self.hs_compute,
                                "description": "If compute Hillshade. Parameter for GUIs."},
@@ -432,6 +543,10 @@ class DefaultValues:
                 "svf_noise": {"value": self.svf_noise,
                               "description": "The level of noise remove [0-don't remove, "
                                              "1-low, 2-med, 3-high]."},
+                "svf_search_mode": {"value": self.svf_search_mode,
+                                    "description": "Horizon search method ['shift' - exact, 'pyramid' - approximate,"
+                                                   " fast for long search radii, 'sweep' - exact along digital"
+                                                   " lines, cost independent of search radius]."},
                 "svf_save_float": {"value": self.svf_save_float,
                                    "description": "If 1 it saves float raster, if 0 it doesn't."},
                 "svf_save_8bit": {"value": self.svf_save_8bit,
@@ -554,6 +669,9 @@ class DefaultValues:
                                                     " All have to be integers!"},
                 "mstp_lightness": {"value": self.mstp_lightness,
                                    "description": "Lightness factor to adjust MSTP visibility."},
+                "mstp_multi_resolution": {"value": self.mstp_multi_resolution,
+                                          "description": "If 1 it computes meso and broad scale on decimated DEM"
+                                                         " (faster, approximate), if 0 it doesn't."},
                 "mstp_save_float": {"value": self.mstp_save_float,
                                   "description": "If 1 it saves float raster, if 0 it doesn't."},
                 "mstp_save_8bit": {"value": self.mstp_save_8bit,
@@ -673,6 +791,8 @@ class DefaultValues:
             default_data = data["default_settings"]
             self.overwrite = int(default_data["overwrite"]["value"])
             self.ve_factor = float(default_data["ve_factor"]["value"])
+            if "workers" in default_data:  # not present in older settings files
+                self.workers = int(default_data["workers"]["value"])
             # Slope gradient
             self.slp_compute = int(default_data["Slope gradient"]["slp_compute"]["value"])
             self.slp_output_units = str(default_data["Slope gradient"]["slp_output_units"]["value"])
@@ -723,6 +843,8 @@ class DefaultValues:
             self.svf_n_dir = int(default_data["Sky-View Factor"]["svf_n_dir"]["value"])
             self.svf_r_max = int(default_data["Sky-View Factor"]["svf_r_max"]["value"])
             self.svf_noise = int(default_data["Sky-View Factor"]["svf_noise"]["value"])
+            if "svf_search_mode" in default_data["Sky-View Factor"]:  # not present in older settings files
+                self.svf_search_mode = str(default_data["Sky-View Factor"]["svf_search_mode"]["value"])
             self.svf_save_float = int(default_data["Sky-View Factor"]["svf_save_float"]["value"])
             self.svf_save_8bit = int(default_data["Sky-View Factor"]["svf_save_8bit"]["value"])
             self.svf_bytscl = (str(default_data["Sky-View Factor"]["svf_bytscl"]["mode"]),
@@ -784,6 +906,9 @@ class DefaultValues:
                                      int(default_data["Multi-scale topographic position"]["mstp_broad_scale"]["max"]),
                                      int(default_data["Multi-scale topographic position"]["mstp_broad_scale"]["step"]))
             self.mstp_lightness = float(default_data["Multi-scale topographic position"]["mstp_lightness"]["value"])
+            if "mstp_multi_resolution" in default_data["Multi-scale topographic position"]:  # not in older files
+                self.mstp_multi_resolution = int(
+                    default_data["Multi-scale topographic position"]["mstp_multi_resolution"]["value"])
             self.mstp_save_float = int(default_data["Multi-scale topographic position"]["mstp_save_float"]["value"])
             self.mstp_save_8bit = int(default_data["Multi-scale topographic position"]["mstp_save_8bit"]["value"])
             self.mstp_bytscl = (str(default_data["Multi-scale topographic position"]["mstp_bytscl"]["mode"]),
@@ -1092,121 +1217,123 @@ class DefaultValues:
             no_data: Optional[float] = None
     ):
         """Converts (byte scale) float visualization to 8bit. Resolution (x_res, y_res) and no_data needed only for
-         multiple directions hillshade! Method first normalize then byte scale (0-255)."""
+         multiple directions hillshade! Method normalizes and byte scales (0-255) in one pass
+         (rvt.blend_func.normalize_image_8bit)."""
         if visualization == RVTVisualization.HILLSHADE:
-            norm_arr = rvt.blend_func.normalize_image(visualization="hs", image=float_arr,
-                                                      min_norm=self.hs_bytscl[1], max_norm=self.hs_bytscl[2],
-                                                      normalization=self.hs_bytscl[0])
-            return rvt.vis.byte_scale(data=norm_arr, no_data=np.nan, c_min=0, c_max=1)
+            return rvt.blend_func.normalize_image_8bit(visualization="hs", image=float_arr,
+                                                       min_norm=self.hs_bytscl[1], max_norm=self.hs_bytscl[2],
+                                                       normalization=self.hs_bytscl[0])
         elif visualization == RVTVisualization.SLOPE:
-            norm_arr = rvt.blend_func.normalize_image(visualization="slp", image=float_arr,
-                                                      min_norm=self.slp_bytscl[1], max_norm=self.slp_bytscl[2],
-                                                      normalization=self.slp_bytscl[0])
-            return rvt.vis.byte_scale(data=norm_arr, no_data=np.nan, c_min=0, c_max=1)
+            return rvt.blend_func.normalize_image_8bit(visualization="slp", image=float_arr,
+                                                       min_norm=self.slp_bytscl[1], max_norm=self.slp_bytscl[2],
+                                                       normalization=self.slp_bytscl[0])
         elif visualization == RVTVisualization.SHADOW:
             return float_arr
         elif visualization == RVTVisualization.MULTI_HILLSHADE:
             # Be careful when multihillshade we input dem, because we have to calculate hillshade in 3 directions
-            red_band_arr = rvt.vis.hillshade(dem=float_arr, resolution_x=x_res, resolution_y=y_res,
-                                             sun_elevation=self.mhs_sun_el, sun_azimuth=315, no_data=no_data)
-            green_band_arr = rvt.vis.hillshade(dem=float_arr, resolution_x=x_res, resolution_y=y_res,
-                                               sun_elevation=self.mhs_sun_el, sun_azimuth=22.5, no_data=no_data)
-            blue_band_arr = rvt.vis.hillshade(dem=float_arr, resolution_x=x_res, resolution_y=y_res,
-                                              sun_elevation=self.mhs_sun_el, sun_azimuth=90, no_data=no_data)
+            # slope and aspect from the cache are computed with ve_factor, these bands are not exaggerated
+            slope, aspect = (None, None)
+            if self.ve_factor == 1:
+                slope, aspect = self._get_slope_aspect(dem_arr=float_arr, resolution_x=x_res, resolution_y=y_res,
+                                                       no_data=no_data)
+            red_band_arr, green_band_arr, blue_band_arr = rvt.vis.multi_hillshade(
+                dem=float_arr, resolution_x=x_res, resolution_y=y_res, sun_elevation=self.mhs_sun_el,
+                sun_azimuths=[315, 22.5, 90], slope=slope, aspect=aspect, no_data=no_data
+            )
+            normalization = "value"
             if self.mhs_bytscl[0].lower() == "percent" or self.slp_bytscl[0].lower() == "perc":
-                red_band_arr = rvt.blend_func.normalize_perc(
-                    image=red_band_arr, minimum=self.mhs_bytscl[1], maximum=self.mhs_bytscl[2]
-                )
-                red_band_arr = rvt.vis.byte_scale(data=red_band_arr, no_data=np.nan, c_min=0, c_max=1)
-                green_band_arr = rvt.blend_func.normalize_perc(
-                    image=green_band_arr, minimum=self.mhs_bytscl[1], maximum=self.mhs_bytscl[2]
-                )
-                green_band_arr = rvt.vis.byte_scale(data=green_band_arr, no_data=np.nan, c_min=0, c_max=1)
-                blue_band_arr = rvt.blend_func.normalize_perc(
-                    image=blue_band_arr, minimum=self.mhs_bytscl[1], maximum=self.mhs_bytscl[2]
-                )
-                blue_band_arr = rvt.vis.byte_scale(data=blue_band_arr, no_data=np.nan, c_min=0, c_max=1)
-            else:  # self.mhs_bytscl[0] == "value"
-                red_band_arr = rvt.blend_func.normalize_lin(
-                    image=red_band_arr, minimum=self.mhs_bytscl[1], maximum=self.mhs_bytscl[2]
-                )
-                red_band_arr = rvt.vis.byte_scale(
-                    data=red_band_arr, no_data=np.nan, c_min=0, c_max=1
-                )
-                green_band_arr = rvt.blend_func.normalize_lin(
-                    image=green_band_arr, minimum=self.mhs_bytscl[1], maximum=self.mhs_bytscl[2]
-                )
-                green_band_arr = rvt.vis.byte_scale(
-                    data=green_band_arr, no_data=np.nan, c_min=0, c_max=1
-                )
-                blue_band_arr = rvt.blend_func.normalize_lin(
-                    image=blue_band_arr, minimum=self.mhs_bytscl[1], maximum=self.mhs_bytscl[2]
-                )
-                blue_band_arr = rvt.vis.byte_scale(
-                    data=blue_band_arr, no_data=np.nan, c_min=0, c_max=1
-                )
-            multi_hillshade_8bit_arr = np.array([red_band_arr, green_band_arr, blue_band_arr])
+                normalization = "perc"
+            multi_hillshade_8bit_arr = np.empty((3,) + red_band_arr.shape, dtype=np.uint8)
+            for i_band, band_arr in enumerate([red_band_arr, green_band_arr, blue_band_arr]):
+                rvt.blend_func.normalize_image_8bit(visualization="mhs", image=band_arr, min_norm=self.mhs_bytscl[1],
+                                                   max_norm=self.mhs_bytscl[2], normalization=normalization,
+                                                   out=multi_hillshade_8bit_arr[i_band])
             return multi_hillshade_8bit_arr
         elif visualization == RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL:
-            norm_arr = rvt.blend_func.normalize_image(visualization="slrm", image=float_arr,
-                                                      min_norm=self.slrm_bytscl[1], max_norm=self.slrm_bytscl[2],
-                                                      normalization=self.slrm_bytscl[0])
-            return rvt.vis.byte_scale(data=norm_arr, no_data=np.nan, c_min=0, c_max=1)
+            return rvt.blend_func.normalize_image_8bit(visualization="slrm", image=float_arr,
+                                                       min_norm=self.slrm_bytscl[1], max_norm=self.slrm_bytscl[2],
+                                                       normalization=self.slrm_bytscl[0])
         elif visualization == RVTVisualization.SKY_VIEW_FACTOR:
-            norm_arr = rvt.blend_func.normalize_image(visualization="svf", image=float_arr,
-                                                      min_norm=self.svf_bytscl[1], max_norm=self.svf_bytscl[2],
-                                                      normalization=self.svf_bytscl[0])
-            return rvt.vis.byte_scale(data=norm_arr, no_data=np.nan, c_min=0, c_max=1)
+            return rvt.blend_func.normalize_image_8bit(visualization="svf", image=float_arr,
+                                                       min_norm=self.svf_bytscl[1], max_norm=self.svf_bytscl[2],
+                                                       normalization=self.svf_bytscl[0])
         elif visualization == RVTVisualization.ANISOTROPIC_SKY_VIEW_FACTOR:
-            norm_arr = rvt.blend_func.normalize_image(visualization="asvf", image=float_arr,
-                                                      min_norm=self.asvf_bytscl[1], max_norm=self.asvf_bytscl[2],
-                                                      normalization=self.asvf_bytscl[0])
-            return rvt.vis.byte_scale(data=norm_arr, no_data=np.nan, c_min=0, c_max=1)
+            return rvt.blend_func.normalize_image_8bit(visualization="asvf", image=float_arr,
+                                                       min_norm=self.asvf_bytscl[1], max_norm=self.asvf_bytscl[2],
+                                                       normalization=self.asvf_bytscl[0])
         elif visualization == RVTVisualization.POSITIVE_OPENNESS:
-            norm_arr = rvt.blend_func.normalize_image(visualization="pos_opns", image=float_arr,
-                                                      min_norm=self.pos_opns_bytscl[1],
-                                                      max_norm=self.pos_opns_bytscl[2],
-                                                      normalization=self.pos_opns_bytscl[0])
-            return rvt.vis.byte_scale(data=norm_arr, no_data=np.nan, c_min=0, c_max=1)
+            return rvt.blend_func.normalize_image_8bit(visualization="pos_opns", image=float_arr,
+                                                       min_norm=self.pos_opns_bytscl[1],
+                                                       max_norm=self.pos_opns_bytscl[2],
+                                                       normalization=self.pos_opns_bytscl[0])
         elif visualization == RVTVisualization.NEGATIVE_OPENNESS:
-            norm_arr = rvt.blend_func.normalize_image(visualization="neg_opns", image=float_arr,
-                                                      min_norm=self.neg_opns_bytscl[1],
-                                                      max_norm=self.neg_opns_bytscl[2],
-                                                      normalization=self.neg_opns_bytscl[0])
-            return rvt.vis.byte_scale(data=norm_arr, no_data=np.nan, c_min=0, c_max=1)
+            return rvt.blend_func.normalize_image_8bit(visualization="neg_opns", image=float_arr,
+                                                       min_norm=self.neg_opns_bytscl[1],
+                                                       max_norm=self.neg_opns_bytscl[2],
+                                                       normalization=self.neg_opns_bytscl[0])
         elif visualization == RVTVisualization.SKY_ILLUMINATION:
-            norm_arr = rvt.blend_func.normalize_image(visualization="sim", image=float_arr,
-                                                      min_norm=self.sim_bytscl[1], max_norm=self.sim_bytscl[2],
-                                                      normalization=self.sim_bytscl[0])
-            return rvt.vis.byte_scale(data=norm_arr, no_data=np.nan, c_min=0, c_max=1)
+            return rvt.blend_func.normalize_image_8bit(visualization="sim", image=float_arr,
+                                                       min_norm=self.sim_bytscl[1], max_norm=self.sim_bytscl[2],
+                                                       normalization=self.sim_bytscl[0])
         elif visualization == RVTVisualization.LOCAL_DOMINANCE:
-            norm_arr = rvt.blend_func.normalize_image(visualization="ld", image=float_arr,
-                                                      min_norm=self.ld_bytscl[1], max_norm=self.ld_bytscl[2],
-                                                      normalization=self.ld_bytscl[0])
-            return rvt.vis.byte_scale(data=norm_arr, no_data=np.nan, c_min=0, c_max=1)
+            return rvt.blend_func.normalize_image_8bit(visualization="ld", image=float_arr,
+                                                       min_norm=self.ld_bytscl[1], max_norm=self.ld_bytscl[2],
+                                                       normalization=self.ld_bytscl[0])
         elif visualization == RVTVisualization.MULTI_SCALE_RELIEF_MODEL:
-            norm_arr = rvt.blend_func.normalize_image(visualization="msrm", image=float_arr,
-                                                      min_norm=self.msrm_bytscl[1], max_norm=self.msrm_bytscl[2],
-                                                      normalization=self.msrm_bytscl[0])
-            return rvt.vis.byte_scale(data=norm_arr, no_data=np.nan, c_min=0, c_max=1)
+            return rvt.blend_func.normalize_image_8bit(visualization="msrm", image=float_arr,
+                                                       min_norm=self.msrm_bytscl[1], max_norm=self.msrm_bytscl[2],
+                                                       normalization=self.msrm_bytscl[0])
         elif visualization == RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION:
             # This might not be necessary, as all mstp data should already be between 0 and 1
-            norm_arr = rvt.blend_func.normalize_image(
+            return rvt.blend_func.normalize_image_8bit(
                 visualization="mstp",
                 image=float_arr,
                 min_norm=self.mstp_bytscl[1],
                 max_norm=self.mstp_bytscl[2],
                 normalization=self.mstp_bytscl[0]
             )
-
-            return rvt.vis.byte_scale(data=norm_arr, no_data=np.nan, c_min=0, c_max=1)
         else:
             raise Exception("rvt.default.DefaultValues.float_to_8bit: Wrong visualization (visualization) parameter!")
 
+    @contextmanager
+    def cache_derivatives(self, max_bytes=2 ** 30):
+        """Context in which get_* methods share slope and aspect of the same DEM array and save_* methods read
+        the DEM once (see DerivativeCache). Cache is released when the context exits."""
+        previous_cache = self.derivative_cache
+        self.derivative_cache = DerivativeCache(max_bytes=max_bytes)
+        try:
+            yield self.derivative_cache
+        finally:
+            self.derivative_cache.clear()
+            self.derivative_cache = previous_cache
+
+    def _get_raster_arr(self, raster_path):
+        if self.derivative_cache is None:
+            return get_raster_arr(raster_path=raster_path)
+        return self.derivative_cache.get_raster_arr(raster_path=raster_path)
+
+    def _get_slope_aspect(self, dem_arr, resolution_x, resolution_y, no_data=None):
+        """Returns cached slope and aspect in radians, (None, None) if there is no cache."""
+        if self.derivative_cache is None:
+            return None, None
+        dict_slp_asp = self.derivative_cache.get_slope_aspect(dem_arr=dem_arr, resolution_x=resolution_x,
+                                                              resolution_y=resolution_y, ve_factor=self.ve_factor,
+                                                              no_data=no_data)
+        return dict_slp_asp["slope"], dict_slp_asp["aspect"]
+
     def get_slope(self, dem_arr, resolution_x, resolution_y, no_data=None):
-        slope_arr = rvt.vis.slope_aspect(dem=dem_arr, resolution_x=resolution_x, resolution_y=resolution_y,
-                                         ve_factor=self.ve_factor, output_units=self.slp_output_units,
-                                         no_data=no_data)["slope"]
+        slope, _ = (None, None)
+        if self.slp_output_units in ("radian", "degree"):
+            slope, _ = self._get_slope_aspect(dem_arr=dem_arr, resolution_x=resolution_x, resolution_y=resolution_y,
+                                              no_data=no_data)
+        if slope is None:
+            slope_arr = rvt.vis.slope_aspect(dem=dem_arr, resolution_x=resolution_x, resolution_y=resolution_y,
+                                             ve_factor=self.ve_factor, output_units=self.slp_output_units,
+                                             no_data=no_data)["slope"]
+        elif self.slp_output_units == "degree":
+            slope_arr = np.rad2deg(slope)
+        else:
+            slope_arr = slope.copy()
         return slope_arr
 
     def save_slope(self, dem_path, custom_dir=None, save_float=None, save_8bit=None):
@@ -1246,8 +1373,8 @@ class DefaultValues:
             if os.path.isfile(slope_8bit_path) and not self.overwrite:
                 return 0
 
-        dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile calculation
+        # tile by tile calculation
+        if self._is_tile_by_tile(dem_path=dem_path, visualizations=[RVTVisualization.SLOPE]):
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -1260,7 +1387,7 @@ class DefaultValues:
             )
             return 1
         else:  # singleprocess
-            dict_arr_res = get_raster_arr(raster_path=dem_path)
+            dict_arr_res = self._get_raster_arr(raster_path=dem_path)
             dem_arr = dict_arr_res["array"]
             no_data = dict_arr_res["no_data"]
             x_res = dict_arr_res["resolution"][0]
@@ -1288,9 +1415,11 @@ class DefaultValues:
         return shadow_arr
 
     def get_hillshade(self, dem_arr, resolution_x, resolution_y, no_data=None):
+        slope, aspect = self._get_slope_aspect(dem_arr=dem_arr, resolution_x=resolution_x, resolution_y=resolution_y,
+                                               no_data=no_data)
         hillshade_arr = rvt.vis.hillshade(dem=dem_arr, resolution_x=resolution_x, resolution_y=resolution_y,
                                           sun_azimuth=self.hs_sun_azi, sun_elevation=self.hs_sun_el,
-                                          ve_factor=self.ve_factor, no_data=no_data)
+                                          slope=slope, aspect=aspect, ve_factor=self.ve_factor, no_data=no_data)
         return hillshade_arr
 
     def save_hillshade(self, dem_path, custom_dir=None, save_float=None, save_8bit=None, save_shadow=None):
@@ -1342,8 +1471,9 @@ class DefaultValues:
             if os.path.isfile(hillshade_8bit_path) and os.path.isfile(shadow_path) and not self.overwrite:
                 return 0
 
-        dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        visualizations = [RVTVisualization.HILLSHADE, RVTVisualization.SHADOW] if save_shadow else \
+            [RVTVisualization.HILLSHADE]
+        if self._is_tile_by_tile(dem_path=dem_path, visualizations=visualizations):  # tile by tile
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -1365,7 +1495,7 @@ class DefaultValues:
                 )
             return 1
         else:  # singleprocess
-            dict_arr_res = get_raster_arr(raster_path=dem_path)
+            dict_arr_res = self._get_raster_arr(raster_path=dem_path)
             dem_arr = dict_arr_res["array"]
             no_data = dict_arr_res["no_data"]
             x_res = dict_arr_res["resolution"][0]
@@ -1397,9 +1527,12 @@ class DefaultValues:
             return 1
 
     def get_multi_hillshade(self, dem_arr, resolution_x, resolution_y, no_data=None):
+        slope, aspect = self._get_slope_aspect(dem_arr=dem_arr, resolution_x=resolution_x, resolution_y=resolution_y,
+                                               no_data=no_data)
         multi_hillshade_arr = rvt.vis.multi_hillshade(dem=dem_arr, resolution_x=resolution_x, resolution_y=resolution_y,
                                                       nr_directions=self.mhs_nr_dir, sun_elevation=self.mhs_sun_el,
-                                                      ve_factor=self.ve_factor, no_data=no_data)
+                                                      slope=slope, aspect=aspect, ve_factor=self.ve_factor,
+                                                      no_data=no_data)
         return multi_hillshade_arr
 
     def save_multi_hillshade(self, dem_path, custom_dir=None, save_float=None, save_8bit=None):
@@ -1441,8 +1574,8 @@ class DefaultValues:
             if os.path.isfile(multi_hillshade_8bit_path) and not self.overwrite:
                 return 0
 
-        dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        # tile by tile
+        if self._is_tile_by_tile(dem_path=dem_path, visualizations=[RVTVisualization.MULTI_HILLSHADE]):
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -1455,7 +1588,7 @@ class DefaultValues:
             )
             return 1
         else:  # singleprocess
-            dict_arr_res = get_raster_arr(raster_path=dem_path)
+            dict_arr_res = self._get_raster_arr(raster_path=dem_path)
             dem_arr = dict_arr_res["array"]
             no_data = dict_arr_res["no_data"]
             x_res = dict_arr_res["resolution"][0]
@@ -1525,8 +1658,8 @@ class DefaultValues:
             if os.path.isfile(slrm_8bit_path) and not self.overwrite:
                 return 0
 
-        dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        # tile by tile
+        if self._is_tile_by_tile(dem_path=dem_path, visualizations=[RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL]):
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -1539,7 +1672,7 @@ class DefaultValues:
             )
             return 1
         else:  # singleprocess
-            dict_arr_res = get_raster_arr(raster_path=dem_path)
+            dict_arr_res = self._get_raster_arr(raster_path=dem_path)
             dem_arr = dict_arr_res["array"]
             no_data = dict_arr_res["no_data"]
             slrm_arr = self.get_slrm(dem_arr=dem_arr, no_data=no_data).astype('float32')
@@ -1561,23 +1694,29 @@ class DefaultValues:
             return 1
 
     def get_sky_view_factor(self, dem_arr, resolution, compute_svf=True, compute_asvf=False, compute_opns=False,
-                            no_data=None):
+                            no_data=None, compute_neg_opns=False):
         dict_svf_asvf_opns = rvt.vis.sky_view_factor(dem=dem_arr, resolution=resolution, compute_svf=compute_svf,
                                                      compute_opns=compute_opns, compute_asvf=compute_asvf,
                                                      svf_n_dir=self.svf_n_dir, svf_r_max=self.svf_r_max,
                                                      svf_noise=self.svf_noise, asvf_dir=self.asvf_dir,
                                                      asvf_level=self.asvf_level, ve_factor=self.ve_factor,
-                                                     no_data=no_data)
+                                                     no_data=no_data, compute_neg_opns=compute_neg_opns,
+                                                     workers=self.workers, search_mode=self.svf_search_mode)
         return dict_svf_asvf_opns
 
     def save_sky_view_factor(self, dem_path, save_svf=True, save_asvf=False, save_opns=False, custom_dir=None,
-                             save_float=None, save_8bit=None):
-        """Calculates and saves Sky-view factor(save_svf=True), Anisotropic Sky-view factor(save_asvf=True) and
-        Positive Openness(save_opns=True) from dem (dem_path) with default parameters.
+                             save_float=None, save_8bit=None, save_neg_opns=False):
+        """Calculates and saves Sky-view factor(save_svf=True), Anisotropic Sky-view factor(save_asvf=True),
+        Positive Openness(save_opns=True) and Negative Openness(save_neg_opns=True) from dem (dem_path) with default
+        parameters in a single horizon search.
         If custom_dir is None it saves in dem directory else in custom_dir. If path to file already exists we can
         overwrite file (overwrite=1) or not (overwrite=0). If save_float is True method creates Gtiff with real values,
-        if save_8bit is True method creates GTiff with bytescaled values (0-255)."""
+        if save_8bit is True method creates GTiff with bytescaled values (0-255). If save_float or save_8bit is None,
+        Negative Openness takes its own defaults (neg_opns_save_float, neg_opns_save_8bit)."""
 
+        # negative openness has its own defaults (self) for saving float and 8bit
+        neg_opns_save_float = self.neg_opns_save_float if save_float is None else save_float
+        neg_opns_save_8bit = self.neg_opns_save_8bit if save_8bit is None else save_8bit
         # if save_float is None it takes boolean from default (self)
         if save_float is None:
             save_float = self.svf_save_float
@@ -1597,6 +1736,8 @@ class DefaultValues:
         svf_8bit_path = ""
         asvf_8bit_path = ""
         opns_8bit_path = ""
+        neg_opns_path = ""
+        neg_opns_8bit_path = ""
         if custom_dir is None:
             if save_svf:
                 svf_path = self.get_svf_path(dem_path)
@@ -1607,6 +1748,9 @@ class DefaultValues:
             if save_opns:
                 opns_path = self.get_opns_path(dem_path)
                 opns_8bit_path = self.get_opns_path(dem_path, bit8=True)
+            if save_neg_opns:
+                neg_opns_path = self.get_neg_opns_path(dem_path)
+                neg_opns_8bit_path = self.get_neg_opns_path(dem_path, bit8=True)
         else:
             if save_svf:
                 svf_path = os.path.join(custom_dir, self.get_svf_file_name(dem_path))
@@ -1617,63 +1761,58 @@ class DefaultValues:
             if save_opns:
                 opns_path = os.path.join(custom_dir, self.get_opns_file_name(dem_path))
                 opns_8bit_path = os.path.join(custom_dir, self.get_opns_file_name(dem_path, bit8=True))
-
+            if save_neg_opns:
+                neg_opns_path = os.path.join(custom_dir, self.get_neg_opns_file_name(dem_path))
+                neg_opns_8bit_path = os.path.join(custom_dir, self.get_neg_opns_file_name(dem_path, bit8=True))
+
+        # negative openness files already exist (or are not needed) and overwrite=0
+        neg_opns_exists = not save_neg_opns or (
+                (not neg_opns_save_float or os.path.isfile(neg_opns_path)) and
+                (not neg_opns_save_8bit or os.path.isfile(neg_opns_8bit_path)) and not self.overwrite
+        )
         # if file already exists and overwrite=0
         if save_float and save_8bit:
             if os.path.isfile(svf_path) and os.path.isfile(asvf_path) and os.path.isfile(opns_path) and \
                     os.path.isfile(svf_8bit_path) and os.path.isfile(asvf_8bit_path) and \
-                    os.path.isfile(opns_8bit_path) and not self.overwrite:
+                    os.path.isfile(opns_8bit_path) and not self.overwrite and neg_opns_exists:
                 return 0
         elif save_float and not save_8bit:
             if os.path.isfile(svf_path) and os.path.isfile(asvf_path) and os.path.isfile(opns_path) \
-                    and not self.overwrite:
+                    and not self.overwrite and neg_opns_exists:
                 return 0
         elif not save_float and save_8bit:
             if os.path.isfile(svf_8bit_path) and os.path.isfile(asvf_8bit_path) and os.path.isfile(opns_8bit_path) \
-                    and not self.overwrite:
+                    and not self.overwrite and neg_opns_exists:
                 return 0
 
-        dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        visualizations = [visualization for visualization, save in (
+            (RVTVisualization.SKY_VIEW_FACTOR, save_svf), (RVTVisualization.ANISOTROPIC_SKY_VIEW_FACTOR, save_asvf),
+            (RVTVisualization.POSITIVE_OPENNESS, save_opns), (RVTVisualization.NEGATIVE_OPENNESS, save_neg_opns)
+        ) if save]
+        if self._is_tile_by_tile(dem_path=dem_path, visualizations=visualizations):  # tile by tile
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
-            if save_svf:
-                rvt.tile.save_rvt_visualization_tile_by_tile(
-                    rvt_visualization=RVTVisualization.SKY_VIEW_FACTOR,
-                    rvt_default=self,
-                    dem_path=Path(dem_path),
-                    output_dir_path=Path(custom_dir),
-                    save_float=save_float,
-                    save_8bit=save_8bit
-                )
-            if save_asvf:
-                rvt.tile.save_rvt_visualization_tile_by_tile(
-                    rvt_visualization=RVTVisualization.ANISOTROPIC_SKY_VIEW_FACTOR,
-                    rvt_default=self,
-                    dem_path=Path(dem_path),
-                    output_dir_path=Path(custom_dir),
-                    save_float=save_float,
-                    save_8bit=save_8bit
-                )
-            if save_opns:
-                rvt.tile.save_rvt_visualization_tile_by_tile(
-                    rvt_visualization=RVTVisualization.POSITIVE_OPENNESS,
-                    rvt_default=self,
-                    dem_path=Path(dem_path),
-                    output_dir_path=Path(custom_dir),
-                    save_float=save_float,
-                    save_8bit=save_8bit
-                )
+            # one pass over tiles and one horizon search for all outputs (negative openness has its own defaults)
+            rvt.tile.save_rvt_visualizations_tile_by_tile(
+                rvt_visualizations=visualizations,
+                rvt_default=self,
+                dem_path=Path(dem_path),
+                output_dir_path=Path(custom_dir),
+                save_float=[bool(neg_opns_save_float if visualization == RVTVisualization.NEGATIVE_OPENNESS else
+                                 save_float) for visualization in visualizations],
+                save_8bit=[bool(neg_opns_save_8bit if visualization == RVTVisualization.NEGATIVE_OPENNESS else
+                                save_8bit) for visualization in visualizations]
+            )
             return 1
         else:
-            dict_arr_res = get_raster_arr(raster_path=dem_path)
+            dict_arr_res = self._get_raster_arr(raster_path=dem_path)
             dem_arr = dict_arr_res["array"]
             no_data = dict_arr_res["no_data"]
             x_res = dict_arr_res["resolution"][0]
             y_res = dict_arr_res["resolution"][1]
             dict_svf_asvf_opns = self.get_sky_view_factor(dem_arr=dem_arr, resolution=x_res, compute_svf=save_svf,
                                                           compute_asvf=save_asvf, compute_opns=save_opns,
-                                                          no_data=no_data)
+                                                          no_data=no_data, compute_neg_opns=save_neg_opns)
             if save_float:
                 if save_svf:
                     if os.path.isfile(svf_path) and not self.overwrite:  # file exists and overwrite=0
@@ -1722,15 +1861,31 @@ class DefaultValues:
                         )
                         save_raster(src_raster_path=dem_path, out_raster_path=opns_8bit_path,
                                     out_raster_arr=opns_8bit_arr, e_type=1)
+            if save_neg_opns:
+                if neg_opns_save_float:
+                    if os.path.isfile(neg_opns_path) and not self.overwrite:  # file exists and overwrite=0
+                        pass
+                    else:  # neg_opns_path, file doesn't exists or exists and overwrite=1
+                        save_raster(src_raster_path=dem_path, out_raster_path=neg_opns_path,
+                                    out_raster_arr=dict_svf_asvf_opns["neg_opns"].astype('float32'), no_data=np.nan)
+                if neg_opns_save_8bit:
+                    if os.path.isfile(neg_opns_8bit_path) and not self.overwrite:  # file exists and overwrite=0
+                        pass
+                    else:  # neg_opns_8bit_path, file doesn't exists or exists and overwrite=1
+                        neg_opns_8bit_arr = self.float_to_8bit(
+                            float_arr=dict_svf_asvf_opns["neg_opns"], visualization=RVTVisualization.NEGATIVE_OPENNESS
+                        )
+                        save_raster(src_raster_path=dem_path, out_raster_path=neg_opns_8bit_path,
+                                    out_raster_arr=neg_opns_8bit_arr, e_type=1)
             return 1
 
     def get_neg_opns(self, dem_arr, resolution, no_data=None):
-        dem_arr = -1 * dem_arr
         dict_neg_opns = rvt.vis.sky_view_factor(dem=dem_arr, resolution=resolution, svf_n_dir=self.svf_n_dir,
                                                 svf_r_max=self.svf_r_max, svf_noise=self.svf_noise,
-                                                compute_svf=False, compute_asvf=False, compute_opns=True,
-                                                ve_factor=self.ve_factor, no_data=no_data)
-        neg_opns_arr = dict_neg_opns["opns"]
+                                                compute_svf=False, compute_asvf=False, compute_opns=False,
+                                                compute_neg_opns=True, ve_factor=self.ve_factor, no_data=no_data,
+                                                workers=self.workers, search_mode=self.svf_search_mode)
+        neg_opns_arr = dict_neg_opns["neg_opns"]
         return neg_opns_arr
 
     def save_neg_opns(self, dem_path, custom_dir=None, save_float=None, save_8bit=None):
@@ -1770,8 +1925,8 @@ class DefaultValues:
             if os.path.isfile(neg_opns_8bit_path) and not self.overwrite:
                 return 0
 
-        dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        # tile by tile
+        if self._is_tile_by_tile(dem_path=dem_path, visualizations=[RVTVisualization.NEGATIVE_OPENNESS]):
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -1784,7 +1939,7 @@ class DefaultValues:
             )
             return 1
         else:  # singleprocess
-            dict_arr_res = get_raster_arr(raster_path=dem_path)
+            dict_arr_res = self._get_raster_arr(raster_path=dem_path)
             dem_arr = dict_arr_res["array"]
             no_data = dict_arr_res["no_data"]
             x_res = dict_arr_res["resolution"][0]
@@ -1809,12 +1964,14 @@ class DefaultValues:
             return 1
 
     def get_sky_illumination(self, dem_arr, resolution, no_data=None):
+        slope, aspect = self._get_slope_aspect(dem_arr=dem_arr, resolution_x=resolution, resolution_y=resolution,
+                                               no_data=no_data)
         sky_illumination_arr = rvt.vis.sky_illumination(dem=dem_arr, resolution=resolution, sky_model=self.sim_sky_mod,
                                                         compute_shadow=bool(self.sim_compute_shadow),
                                                         max_fine_radius=self.sim_shadow_dist,
                                                         num_directions=self.sim_nr_dir, shadow_az=self.sim_shadow_az,
                                                         shadow_el=self.sim_shadow_el, ve_factor=self.ve_factor,
-                                                        no_data=no_data)
+                                                        no_data=no_data, slope=slope, aspect=aspect)
         return sky_illumination_arr
 
     def save_sky_illumination(self, dem_path, custom_dir=None, save_float=None, save_8bit=None):
@@ -1856,8 +2013,8 @@ class DefaultValues:
             if os.path.isfile(sky_illumination_8bit_path) and not self.overwrite:
                 return 0
 
-        dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        # tile by tile
+        if self._is_tile_by_tile(dem_path=dem_path, visualizations=[RVTVisualization.SKY_ILLUMINATION]):
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -1870,7 +2027,7 @@ class DefaultValues:
             )
             return 1
         else:  # singleprocess
-            dict_arr_res = get_raster_arr(raster_path=dem_path)
+            dict_arr_res = self._get_raster_arr(raster_path=dem_path)
             dem_arr = dict_arr_res["array"]
             no_data = dict_arr_res["no_data"]
             x_res = dict_arr_res["resolution"][0]
@@ -1899,7 +2056,7 @@ class DefaultValues:
         local_dominance_arr = rvt.vis.local_dominance(dem=dem_arr, min_rad=self.ld_min_rad, max_rad=self.ld_max_rad,
                                                       rad_inc=self.ld_rad_inc, angular_res=self.ld_anglr_res,
                                                       observer_height=self.ld_observer_h, ve_factor=self.ve_factor,
-                                                      no_data=no_data)
+                                                      no_data=no_data, workers=self.workers)
         return local_dominance_arr
 
     def save_local_dominance(self, dem_path, custom_dir=None, save_float=None, save_8bit=None):
@@ -1941,8 +2098,8 @@ class DefaultValues:
             if os.path.isfile(local_dominance_8bit_path) and not self.overwrite:
                 return 0
 
-        dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        # tile by tile
+        if self._is_tile_by_tile(dem_path=dem_path, visualizations=[RVTVisualization.LOCAL_DOMINANCE]):
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -1955,7 +2112,7 @@ class DefaultValues:
             )
             return 1
         else:  # singleprocess
-            dict_arr_res = get_raster_arr(raster_path=dem_path)
+            dict_arr_res = self._get_raster_arr(raster_path=dem_path)
             dem_arr = dict_arr_res["array"]
             no_data = dict_arr_res["no_data"]
             local_dominance_arr = self.get_local_dominance(dem_arr=dem_arr, no_data=no_data).astype('float32')
@@ -2019,8 +2176,8 @@ class DefaultValues:
             if os.path.isfile(msrm_8bit_path) and not self.overwrite:
                 return 0
 
-        dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        # tile by tile
+        if self._is_tile_by_tile(dem_path=dem_path, visualizations=[RVTVisualization.MULTI_SCALE_RELIEF_MODEL]):
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -2033,7 +2190,7 @@ class DefaultValues:
             )
             return 1
         else:  # singleprocess
-            dict_arr_res = get_raster_arr(raster_path=dem_path)
+            dict_arr_res = self._get_raster_arr(raster_path=dem_path)
             dem_arr = dict_arr_res["array"]
             no_data = dict_arr_res["no_data"]
             x_res = dict_arr_res["resolution"][0]
@@ -2059,7 +2216,8 @@ class DefaultValues:
 
     def get_mstp(self, dem_arr, no_data=None):
         mstp_arr = rvt.vis.mstp(dem=dem_arr, local_scale=self.mstp_local_scale, meso_scale=self.mstp_meso_scale,
-                                broad_scale=self.mstp_broad_scale, lightness=self.mstp_lightness, no_data=no_data)
+                                broad_scale=self.mstp_broad_scale, lightness=self.mstp_lightness, no_data=no_data,
+                                multi_resolution=bool(self.mstp_multi_resolution))
         return mstp_arr
 
     def save_mstp(self, dem_path, custom_dir=None, save_float=None, save_8bit=None):
@@ -2099,8 +2257,9 @@ class DefaultValues:
             if os.path.isfile(mstp_8bit_path) and not self.overwrite:
                 return 0
 
-        dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile calculation
+        # tile by tile calculation
+        if self._is_tile_by_tile(dem_path=dem_path,
+                                 visualizations=[RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION]):
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -2113,7 +2272,7 @@ class DefaultValues:
             )
             return 1
         else:  # singleprocess
-            dict_arr_res = get_raster_arr(raster_path=dem_path)
+            dict_arr_res = self._get_raster_arr(raster_path=dem_path)
             dem_arr = dict_arr_res["array"]
             no_data = dict_arr_res["no_data"]
 
@@ -2152,31 +2311,131 @@ class DefaultValues:
         """Save all visualizations where self.'visualization'_compute = True also saves float where self.'visualization'
         _save_float = True and 8bit where self.'visualization'_save_8bit = True. In the end method creates log file."""
         start_time = time.time()
-        if self.slp_compute:
-            self.save_slope(dem_path, custom_dir=custom_dir)
-        if self.hs_compute:
-            self.save_hillshade(dem_path, custom_dir=custom_dir)
-        if self.mhs_compute:
-            self.save_multi_hillshade(dem_path, custom_dir=custom_dir)
-        if self.slrm_compute:
-            self.save_slrm(dem_path, custom_dir=custom_dir)
-        if self.svf_compute or self.asvf_compute or self.pos_opns_compute:
-            self.save_sky_view_factor(dem_path, save_svf=bool(self.svf_compute), save_asvf=bool(self.asvf_compute),
-                                      save_opns=bool(self.pos_opns_compute), custom_dir=custom_dir)
-        if self.neg_opns_compute:
-            self.save_neg_opns(dem_path, custom_dir=custom_dir)
-        if self.sim_compute:
-            self.save_sky_illumination(dem_path, custom_dir=custom_dir)
-        if self.ld_compute:
-            self.save_local_dominance(dem_path, custom_dir=custom_dir)
-        if self.msrm_compute:
-            self.save_msrm(dem_path, custom_dir=custom_dir)
-        if self.mstp_compute:
-            self.save_mstp(dem_path, custom_dir=custom_dir)
+        if self._is_tile_by_tile(dem_path=dem_path, visualizations=self._get_computed_visualizations()):
+            # tile by tile, each tile read once for all
+            self._save_visualizations_tile_by_tile(dem_path=dem_path, custom_dir=custom_dir)
+            end_time = time.time()
+            compute_time = end_time - start_time
+            self.create_log_file(dem_path=dem_path, custom_dir=custom_dir, compute_time=compute_time)
+            return
+        # DEM is read and slope/aspect computed once for all visualizations
+        with self.cache_derivatives():
+            if self.slp_compute:
+                self.save_slope(dem_path, custom_dir=custom_dir)
+            if self.hs_compute:
+                self.save_hillshade(dem_path, custom_dir=custom_dir)
+            if self.mhs_compute:
+                self.save_multi_hillshade(dem_path, custom_dir=custom_dir)
+            if self.slrm_compute:
+                self.save_slrm(dem_path, custom_dir=custom_dir)
+            if self.svf_compute or self.asvf_compute or self.pos_opns_compute:
+                # negative openness is computed in the same horizon search
+                self.save_sky_view_factor(dem_path, save_svf=bool(self.svf_compute),
+                                          save_asvf=bool(self.asvf_compute), save_opns=bool(self.pos_opns_compute),
+                                          custom_dir=custom_dir, save_neg_opns=bool(self.neg_opns_compute))
+            elif self.neg_opns_compute:
+                self.save_neg_opns(dem_path, custom_dir=custom_dir)
+            if self.sim_compute:
+                self.save_sky_illumination(dem_path, custom_dir=custom_dir)
+            if self.ld_compute:
+                self.save_local_dominance(dem_path, custom_dir=custom_dir)
+            if self.msrm_compute:
+                self.save_msrm(dem_path, custom_dir=custom_dir)
+            if self.mstp_compute:
+                self.save_mstp(dem_path, custom_dir=custom_dir)
         end_time = time.time()
         compute_time = end_time - start_time
         self.create_log_file(dem_path=dem_path, custom_dir=custom_dir, compute_time=compute_time)
 
+    def _get_visualizations_settings(self):
+        """Returns list of (visualization, compute, save_float, save_8bit) of all RVT visualizations."""
+        return [
+            (RVTVisualization.SLOPE, self.slp_compute, self.slp_save_float, self.slp_save_8bit),
+            (RVTVisualization.HILLSHADE, self.hs_compute, self.hs_save_float, self.hs_save_8bit),
+            (RVTVisualization.SHADOW, self.hs_compute and self.hs_shadow, True, False),
+            (RVTVisualization.MULTI_HILLSHADE, self.mhs_compute, self.mhs_save_float, self.mhs_save_8bit),
+            (RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL, self.slrm_compute, self.slrm_save_float,
+             self.slrm_save_8bit),
+            (RVTVisualization.SKY_VIEW_FACTOR, self.svf_compute, self.svf_save_float, self.svf_save_8bit),
+            (RVTVisualization.ANISOTROPIC_SKY_VIEW_FACTOR, self.asvf_compute, self.svf_save_float,
+             self.svf_save_8bit),
+            (RVTVisualization.POSITIVE_OPENNESS, self.pos_opns_compute, self.svf_save_float, self.svf_save_8bit),
+            (RVTVisualization.NEGATIVE_OPENNESS, self.neg_opns_compute, self.neg_opns_save_float,
+             self.neg_opns_save_8bit),
+            (RVTVisualization.SKY_ILLUMINATION, self.sim_compute, self.sim_save_float, self.sim_save_8bit),
+            (RVTVisualization.LOCAL_DOMINANCE, self.ld_compute, self.ld_save_float, self.ld_save_8bit),
+            (RVTVisualization.MULTI_SCALE_RELIEF_MODEL, self.msrm_compute, self.msrm_save_float,
+             self.msrm_save_8bit),
+            (RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION, self.mstp_compute, self.mstp_save_float,
+             self.mstp_save_8bit)
+        ]
+
+    def _get_computed_visualizations(self):
+        """Returns list of RVT visualizations where self.'visualization'_compute = True (and shadow if hs_shadow)."""
+        return [visualization for visualization, compute, _, _ in self._get_visualizations_settings() if compute]
+
+    def _is_tile_by_tile(self, dem_path, visualizations):
+        """Returns True if visualizations of dem (dem_path) are computed tile by tile. If tile_auto=1 memory cost model
+        (rvt.tile.estimate_rvt_visualizations_memory) decides, else dem size is compared with tile_size_limit."""
+        dem_size = get_raster_size(raster_path=dem_path)
+        if self.tile_auto:
+            return rvt.tile.estimate_rvt_visualizations_memory(
+                rvt_visualizations=visualizations, rvt_default=self, x_size=dem_size[0], y_size=dem_size[1]
+            )["tile_by_tile"]
+        return dem_size[0] * dem_size[1] > self.tile_size_limit
+
+    def estimate_memory(self, dem_path, visualizations=None, memory_limit=None):
+        """Estimates memory of computing visualizations (list of RVTVisualization, if None visualizations where
+        self.'visualization'_compute = True) of dem (dem_path) without computing them. Returns dictionary of
+        rvt.tile.estimate_rvt_visualizations_memory (in_memory_bytes, memory_limit, tile_by_tile, tile_size, overlap,
+        tile_by_tile_bytes). If tile_auto=0 tile_by_tile and tile_size are set by tile_size_limit and tile_size."""
+        if visualizations is None:
+            visualizations = self._get_computed_visualizations()
+        dem_size = get_raster_size(raster_path=dem_path)
+        return rvt.tile.estimate_rvt_visualizations_memory(
+            rvt_visualizations=visualizations, rvt_default=self, x_size=dem_size[0], y_size=dem_size[1],
+            memory_limit=memory_limit
+        )
+
+    def _save_visualizations_tile_by_tile(self, dem_path, custom_dir=None):
+        """Saves all visualizations where self.'visualization'_compute = True (see save_visualizations) in a single
+        tile by tile pass (rvt.tile.save_rvt_visualizations_tile_by_tile). Outputs which already exist are skipped
+        if overwrite=0."""
+        if custom_dir is None:
+            custom_dir = Path(dem_path).parent
+        visualizations = []
+        save_float = []
+        save_8bit = []
+        for visualization, compute, vis_save_float, vis_save_8bit in self._get_visualizations_settings():
+            if not compute:
+                continue
+            if visualization == RVTVisualization.SHADOW:  # shadow has no 8bit version
+                vis_save_8bit = False
+            # if file already exists and overwrite=0
+            if vis_save_float and not self.overwrite and self.get_visualization_path(
+                    rvt_visualization=visualization, dem_path=Path(dem_path), output_dir_path=Path(custom_dir),
+                    path_8bit=False).is_file():
+                vis_save_float = False
+            if vis_save_8bit and not self.overwrite and self.get_visualization_path(
+                    rvt_visualization=visualization, dem_path=Path(dem_path), output_dir_path=Path(custom_dir),
+                    path_8bit=True).is_file():
+                vis_save_8bit = False
+            if vis_save_float or vis_save_8bit:
+                visualizations.append(visualization)
+                save_float.append(bool(vis_save_float))
+                save_8bit.append(bool(vis_save_8bit))
+        if not visualizations:
+            return 0
+        rvt.tile.save_rvt_visualizations_tile_by_tile(
+            rvt_visualizations=visualizations,
+            rvt_default=self,
+            dem_path=Path(dem_path),
+            output_dir_path=Path(custom_dir),
+            save_float=save_float,
+            save_8bit=save_8bit
+        )
+        return 1
+
     def calculate_visualization(
             self,
             visualization: RVTVisualization,
@@ -2275,6 +2534,64 @@ class DefaultValues:
                 )
         return vis_float_arr, vis_8bit_arr
 
+    def calculate_visualizations(
+            self,
+            visualizations: List[RVTVisualization],
+            dem: np.array,
+            resolution_x: float,
+            resolution_y: float,
+            no_data: Optional[float] = None,
+            save_float: List[bool] = None,
+            save_8bit: List[bool] = None
+    ) -> List[Tuple[np.array, np.array]]:  # list[tuple[vis_float_arr, vis_8bit_arr]]
+        """Calculates visualizations on the same dem, returns list of (vis_float_arr, vis_8bit_arr) in order of
+        visualizations. Sky-view factor, Anisotropic Sky-view factor, Positive and Negative Openness are computed in a
+        single horizon search, slope and aspect are shared when called inside cache_derivatives().
+        If save_float or save_8bit is None it is True (save_float) or False (save_8bit) for all visualizations."""
+        if save_float is None:
+            save_float = [True] * len(visualizations)
+        if save_8bit is None:
+            save_8bit = [False] * len(visualizations)
+        horizon_keys = {
+            RVTVisualization.SKY_VIEW_FACTOR: "svf",
+            RVTVisualization.ANISOTROPIC_SKY_VIEW_FACTOR: "asvf",
+            RVTVisualization.POSITIVE_OPENNESS: "opns",
+            RVTVisualization.NEGATIVE_OPENNESS: "neg_opns"
+        }
+        horizon_visualizations = [visualization for visualization in visualizations if visualization in horizon_keys]
+        dict_svf_asvf_opns = None
+        if len(horizon_visualizations) > 1:  # one horizon search for all of them
+            dict_svf_asvf_opns = self.get_sky_view_factor(
+                dem_arr=dem,
+                resolution=resolution_x,
+                compute_svf=RVTVisualization.SKY_VIEW_FACTOR in horizon_visualizations,
+                compute_asvf=RVTVisualization.ANISOTROPIC_SKY_VIEW_FACTOR in horizon_visualizations,
+                compute_opns=RVTVisualization.POSITIVE_OPENNESS in horizon_visualizations,
+                no_data=no_data,
+                compute_neg_opns=RVTVisualization.NEGATIVE_OPENNESS in horizon_visualizations
+            )
+
+        visualizations_arrs = []
+        for visualization, vis_save_float, vis_save_8bit in zip(visualizations, save_float, save_8bit):
+            if dict_svf_asvf_opns is not None and visualization in horizon_keys:
+                vis_arr = dict_svf_asvf_opns[horizon_keys[visualization]]
+                vis_float_arr = vis_arr if vis_save_float else None
+                vis_8bit_arr = None
+                if vis_save_8bit:
+                    vis_8bit_arr = self.float_to_8bit(float_arr=vis_arr, visualization=visualization)
+                visualizations_arrs.append((vis_float_arr, vis_8bit_arr))
+            else:
+                visualizations_arrs.append(self.calculate_visualization(
+                    visualization=visualization,
+                    dem=dem,
+                    resolution_x=resolution_x,
+                    resolution_y=resolution_y,
+                    no_data=no_data,
+                    save_float=vis_save_float,
+                    save_8bit=vis_save_8bit
+                ))
+        return visualizations_arrs
+
     def create_log_file(self, dem_path, custom_dir=None, compute_time=None):
         """Creates log file in custom_dir, if custom_dir=None it creates it in dem directory (dem_path).
         Be aware, all default parameters have to be right! Parameter compute_time is in seconds."""
@@ -2325,10 +2642,13 @@ class DefaultValues:
         dat.write("# Selected visualization parameters\n")
         dat.write("\tOverwrite: {}\n".format(self.overwrite))
         dat.write("\tVertical exaggeration factor: {}\n".format(self.ve_factor))
-        if nr_rows * nr_cols > self.tile_size_limit:
+        memory_estimate = rvt.tile.estimate_rvt_visualizations_memory(
+            rvt_visualizations=self._get_computed_visualizations(), rvt_default=self, x_size=nr_cols, y_size=nr_rows
+        )
+        if memory_estimate["tile_by_tile"]:
             dat.write("\tCalculating tile by tile: {}\n".format("ON"))
-            dat.write("\t\tTile block size: {}x{}\n".format(self.tile_size[0],
-                                                            self.tile_size[1]))
+            dat.write("\t\tTile block size: {}x{}\n".format(memory_estimate["tile_size"][0],
+                                                            memory_estimate["tile_size"][1]))
         else:
             dat.write("\tCalculating tile by tile: {}\n".format("OFF"))
 
@@ -2419,6 +2739,7 @@ class DefaultValues:
             dat.write("\t\tsvf_n_dir=\t\t{}\n".format(self.svf_n_dir))
             dat.write("\t\tsvf_noise=\t\t{}\n".format(self.svf_noise))
             dat.write("\t\tsvf_r_max=\t\t{}\n".format(self.svf_r_max))
+            dat.write("\t\tsvf_search_mode=\t\t{}\n".format(self.svf_search_mode))
             if self.svf_save_float:
                 dat.write("\t\t>> Output file:\n")
                 dat.write("\t\t\t{}\n".format(os.path.abspath(os.path.join(log_dir, self.get_svf_file_name(dem_path)))))
@@ -2434,6 +2755,7 @@ class DefaultValues:
             dat.write("\t\tsvf_n_dir=\t\t{}\n".format(self.svf_n_dir))
             dat.write("\t\tsvf_noise=\t\t{}\n".format(self.svf_noise))
             dat.write("\t\tsvf_r_max=\t\t{}\n".format(self.svf_r_max))
+            dat.write("\t\tsvf_search_mode=\t\t{}\n".format(self.svf_search_mode))
             dat.write("\t\tasvf_level=\t\t{}\n".format(self.asvf_level))
             dat.write("\t\tasvf_dir=\t\t{}\n".format(self.asvf_dir))
             if self.svf_save_float:
@@ -2452,6 +2774,7 @@ class DefaultValues:
             dat.write("\t\tsvf_n_dir=\t\t{}\n".format(self.svf_n_dir))
             dat.write("\t\tsvf_noise=\t\t{}\n".format(self.svf_noise))
             dat.write("\t\tsvf_r_max=\t\t{}\n".format(self.svf_r_max))
+            dat.write("\t\tsvf_search_mode=\t\t{}\n".format(self.svf_search_mode))
             if self.svf_save_float:
                 dat.write("\t\t>> Output file:\n")
                 dat.write("\t\t\t{}\n".format(os.path.abspath(
@@ -2469,6 +2792,7 @@ class DefaultValues:
             dat.write("\t\tsvf_n_dir=\t\t{}\n".format(self.svf_n_dir))
             dat.write("\t\tsvf_noise=\t\t{}\n".format(self.svf_noise))
             dat.write("\t\tsvf_r_max=\t\t{}\n".format(self.svf_r_max))
+            dat.write("\t\tsvf_search_mode=\t\t{}\n".format(self.svf_search_mode))
             if self.neg_opns_save_float:
                 dat.write("\t\t>> Output file:\n")
                 dat.write("\t\t\t{}\n".format(os.path.abspath(
@@ -2527,6 +2851,7 @@ class DefaultValues:
             dat.write("\t\tmstp_broad_scale=\t({}, {}, {})\n".format(
                 self.mstp_broad_scale[0], self.mstp_broad_scale[1], self.mstp_broad_scale[2]))
             dat.write("\t\tmstp_lightness=\t\t{}\n".format(self.mstp_lightness))
+            dat.write("\t\tmstp_multi_resolution=\t{}\n".format(self.mstp_multi_resolution))
             dat.write("\t\t>> Output file:\n")
             dat.write("\t\t\t{}\n".format(os.path.abspath(
                 os.path.join(log_dir, self.get_mstp_file_name(dem_path)))))
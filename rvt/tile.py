@@ -17,11 +17,60 @@ Copyright:
     2010-2022 Research Centre of the Slovenian Academy of Sciences and Arts
     2016-2022 University of Ljubljana, Faculty of Civil and Geodetic Engineering
 """
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import copy
+import multiprocessing
+import os
 from pathlib import Path
-from typing import Callable, Dict, Any, Optional, Union, Tuple
+import queue
+import sys
+import threading
+from typing import Callable, Dict, Any, Iterator, List, Optional, Union, Tuple
+import warnings
 import numpy as np
 from osgeo import gdal
 import rvt.default
+import rvt.vis
+
+try:
+    import psutil  # optional, used to get available system memory
+except ImportError:
+    psutil = None
+
+
+def _align_tile_size(tile_size: int, block_size: int) -> Tuple[int, int]:
+    """Returns (tile_size, block_size) of output raster blocks aligned with the tile grid. Block size is rounded to a
+    multiple of 16 (GTiff requirement) and is not larger than tile size, tile size is rounded up to a multiple of block
+    size, so every tile write (except at the right and bottom raster edge) covers whole blocks."""
+    block_size = max(int(block_size) // 16 * 16, 16)
+    block_size = min(block_size, -(-int(tile_size) // 16) * 16)
+    tile_size = -(-int(tile_size) // block_size) * block_size
+    return tile_size, block_size
+
+
+def _get_creation_options(
+        e_type: int = 6,
+        nr_bands: int = 1,
+        block_size_x: int = 512,
+        block_size_y: int = 512,
+        compress: Optional[str] = "DEFLATE",
+        num_threads: Union[int, str] = "ALL_CPUS"
+) -> List[str]:
+    """Returns GTiff creation options of rasters written tile by tile: tiled (block_size_x, block_size_y), bands
+    interleaved by band (tiles are written band by band), compressed (compress ZSTD, DEFLATE, LZW or None/NONE for no
+    compression) with predictor (floating point predictor for float e_type) in num_threads threads."""
+    options = ["TILED=YES", "BLOCKXSIZE={}".format(block_size_x), "BLOCKYSIZE={}".format(block_size_y),
+               "SPARSE_OK=TRUE"]  # blank blocks aren't written, so blocks are compressed and written only once
+    if nr_bands > 1:
+        options.append("INTERLEAVE=BAND")
+    if compress is None or compress.upper() == "NONE":
+        options.append("BIGTIFF=IF_NEEDED")
+    else:
+        options += ["COMPRESS={}".format(compress.upper()),
+                    "PREDICTOR={}".format(3 if e_type in (6, 7) else 2),  # 6=GDT_Float32, 7=GDT_Float64
+                    "NUM_THREADS={}".format(num_threads),
+                    "BIGTIFF=IF_SAFER"]  # compressed size is unknown
+    return options
 
 
 def _create_blank_raster(
@@ -30,14 +79,18 @@ def _create_blank_raster(
         nr_bands: int = 1,
         no_data: float = np.nan,
         e_type: int = 6,
+        creation_options: Optional[List[str]] = None
 ):
-    """Takes input data set and creates new raster. It copies input data set size, projection and geo info."""
+    """Takes input data set and creates new raster. It copies input data set size, projection and geo info.
+    If creation_options is None, options of _get_creation_options (with default profile) are used."""
+    if creation_options is None:
+        creation_options = _get_creation_options(e_type=e_type, nr_bands=nr_bands)
     gtiff_driver = gdal.GetDriverByName("GTiff")
     band = in_data_set.GetRasterBand(1)
     x_size = band.XSize  # number of columns
     y_size = band.YSize  # number of rows
     out_ds = gtiff_driver.Create(out_raster_path.as_posix(), xsize=x_size, ysize=y_size, bands=nr_bands, eType=e_type,
-                                 options=["BIGTIFF=IF_NEEDED"])
+                                 options=creation_options)
     out_ds.SetProjection(in_data_set.GetProjection())
     out_ds.SetGeoTransform(in_data_set.GetGeoTransform())
     out_ds.GetRasterBand(1).SetNoDataValue(no_data)
@@ -45,6 +98,87 @@ def _create_blank_raster(
     out_ds = None
 
 
+class _TileWriter:
+    """
+    Writes tiles to output rasters in a separate thread, so reading, computing and writing of tiles overlap. Output
+    rasters are opened once (in the writer thread), tiles are passed through a bounded queue (computation waits when
+    the queue is full) and rasters are flushed once when the writer is closed. Use it as context manager.
+    """
+
+    def __init__(self, out_raster_paths, max_queued_tiles=2):
+        """
+        Parameters
+        ----------
+        out_raster_paths : list(Path or None)
+            Output rasters (created before), None for outputs which are not written.
+        max_queued_tiles : int
+            Maximal number of tiles waiting to be written.
+        """
+        self.out_raster_paths = out_raster_paths
+        self._queue = queue.Queue(maxsize=max(int(max_queued_tiles), 1))
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        out_datasets = []
+        try:
+            out_datasets = [None if out_raster_path is None else
+                            gdal.Open(out_raster_path.as_posix(), gdal.GA_Update)
+                            for out_raster_path in self.out_raster_paths]
+            while True:
+                tile = self._queue.get()
+                if tile is None:
+                    break
+                x, y, arrays = tile
+                for out_ds, array in zip(out_datasets, arrays):
+                    if out_ds is None or array is None:
+                        continue
+                    if array.ndim == 2:  # one band
+                        out_ds.GetRasterBand(1).WriteArray(array, x, y)
+                    else:  # multiple bands
+                        for i_band in range(array.shape[0]):
+                            out_ds.GetRasterBand(i_band + 1).WriteArray(array[i_band], x, y)
+            for out_ds in out_datasets:
+                if out_ds is not None:
+                    out_ds.FlushCache()
+        except Exception as error:
+            self._error = error
+            # drain the queue, so write (put) doesn't block forever
+            while self._queue.get() is not None:
+                pass
+        finally:
+            out_datasets = None
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise Exception("rvt.tile._TileWriter: Writing tile failed! ({})".format(self._error)) from self._error
+
+    def write(self, x, y, *arrays):
+        """Queues tile (arrays in order of out_raster_paths) to be written at column x and row y."""
+        self._raise_error()
+        self._queue.put((x, y, arrays))
+
+    def close(self):
+        """Writes queued tiles, flushes and closes output rasters."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:  # exception raised in the context is reported, writer is only closed
+            try:
+                self.close()
+            except Exception:
+                pass
+
+
 def save_visualization_tile_by_tile(
         visualization_function: Callable,
         function_parameters: Optional[Dict[str, Optional[Any]]],
@@ -56,6 +190,9 @@ def save_visualization_tile_by_tile(
         out_raster_nr_of_bands: int = 1,
         out_raster_e_type: int = 6,
         out_visualization_dict_key: Optional[str] = None,
+        block_size: int = 512,
+        compress: Optional[str] = "DEFLATE",
+        num_threads: Union[int, str] = "ALL_CPUS"
 ) -> None:
     """
     Some DEMs are too large to load them into memory. This function reads dem raster tile by tile,
@@ -94,16 +231,23 @@ def save_visualization_tile_by_tile(
         to define result 2D numpy array in dictionary.
         For example rvt.visualization.slope_aspect outputs dictionary with keys "slope" and "aspect".
         To select slope set this parameter to "slope".
+    block_size : int
+        Out raster is tiled in blocks of block_size (multiple of 16, at most tile size). Tile sizes are rounded up to
+        a multiple of block size, so tiles are written in whole blocks.
+    compress : str
+        Out raster compression (ZSTD, DEFLATE, LZW or None for no compression), used with predictor.
+    num_threads : int or str
+        Number of threads compressing out raster ("ALL_CPUS" for all).
 
     Returns
     -------
     out : None
     """
     if not dem_path.exists():
-        Exception("rvt.tile.save_visualization_tile_by_tile: Input dem path does not exist!")
+        raise Exception("rvt.tile.save_visualization_tile_by_tile: Input dem path does not exist!")
     if tile_size_x < 50 or tile_size_y < 50:
-        Exception("rvt.tile.save_visualization_tile_by_tile: Tile size too small (tile_size_x, tile_size_y),"
-                  " it needs to be bigger than 50 pixels!")
+        raise Exception("rvt.tile.save_visualization_tile_by_tile: Tile size too small (tile_size_x, tile_size_y),"
+                        " it needs to be bigger than 50 pixels!")
 
     dem_ds = gdal.Open(dem_path.as_posix())
     gt = dem_ds.GetGeoTransform()
@@ -128,52 +272,19 @@ def save_visualization_tile_by_tile(
         if function_parameters["no_data"] is None:
             function_parameters["no_data"] = no_data
 
+    tile_size_x, block_size_x = _align_tile_size(tile_size=tile_size_x, block_size=block_size)
+    tile_size_y, block_size_y = _align_tile_size(tile_size=tile_size_y, block_size=block_size)
     _create_blank_raster(in_data_set=dem_ds, out_raster_path=out_raster_path, nr_bands=out_raster_nr_of_bands,
-                         e_type=out_raster_e_type)
-
-    for y in range(0, y_size, tile_size_y):
-        if y + tile_size_y < y_size:  # if rows overlap
-            rows = tile_size_y
-        else:
-            rows = y_size - y
-        for x in range(0, x_size, tile_size_x):
-            if x + tile_size_x < x_size:  # if cols overlap
-                cols = tile_size_x
-            else:
-                cols = x_size - x
-
-            # get offset for each tile, check edges
-            left_offset = 0
-            right_offset = 0
-            top_offset = 0
-            bottom_offset = 0
-            if x != 0:  # left offset
-                if x - overlap < 0:  # left overlap
-                    left_offset = x
-                else:
-                    left_offset = overlap
-            if x + cols != x_size:  # right offset
-                if x + cols + overlap > x_size:  # right overlap
-                    right_offset = x_size - x - cols
-                else:
-                    right_offset = overlap
-            if y != 0:  # apply top offset
-                if y - overlap < 0:  # top overlap
-                    top_offset = y
-                else:
-                    top_offset = overlap
-            if y + rows != y_size:  # bottom offset
-                if y + rows + overlap > y_size:  # bottom overlap
-                    bottom_offset = y_size - y - rows
-                else:
-                    bottom_offset = overlap
-
+                         e_type=out_raster_e_type,
+                         creation_options=_get_creation_options(e_type=out_raster_e_type,
+                                                                nr_bands=out_raster_nr_of_bands,
+                                                                block_size_x=block_size_x, block_size_y=block_size_y,
+                                                                compress=compress, num_threads=num_threads))
+
+    with _TileWriter(out_raster_paths=[out_raster_path]) as tile_writer:
+        for x, y, cols, rows, x_off, y_off, cols_off, rows_off in _get_tile_windows(
+                x_size=x_size, y_size=y_size, tile_size_x=tile_size_x, tile_size_y=tile_size_y, overlap=overlap):
             # read tile
-            x_off = x - left_offset
-            y_off = y - top_offset
-            cols_off = cols + left_offset + right_offset
-            rows_off = rows + top_offset + bottom_offset
-
             tile_array = np.array(dem_ds.GetRasterBand(1).ReadAsArray(x_off, y_off, cols_off, rows_off))
             if function_parameters is not None:
                 visualization_array = visualization_function(dem=tile_array, **function_parameters)
@@ -183,37 +294,12 @@ def save_visualization_tile_by_tile(
             if out_visualization_dict_key is not None:
                 visualization_array = visualization_array[out_visualization_dict_key]
 
-            # remove offset from visualization block
-            if out_raster_nr_of_bands == 1:
-                if right_offset == 0 and bottom_offset == 0:
-                    visualization_array = visualization_array[top_offset:, left_offset:]
-                elif right_offset == 0:
-                    visualization_array = visualization_array[top_offset:-bottom_offset, left_offset:]
-                elif bottom_offset == 0:
-                    visualization_array = visualization_array[top_offset:, left_offset:-right_offset]
-                else:
-                    visualization_array = visualization_array[top_offset:-bottom_offset, left_offset:-right_offset]
-            else:
-                if right_offset == 0 and bottom_offset == 0:
-                    visualization_array = visualization_array[:, top_offset:, left_offset:]
-                elif right_offset == 0:
-                    visualization_array = visualization_array[:, top_offset:-bottom_offset, left_offset:]
-                elif bottom_offset == 0:
-                    visualization_array = visualization_array[:, top_offset:, left_offset:-right_offset]
-                else:
-                    visualization_array = visualization_array[:, top_offset:-bottom_offset, left_offset:-right_offset]
+            # remove offset from visualization block (last two axes, also for multiple bands)
+            visualization_array = visualization_array[..., y - y_off:y - y_off + rows, x - x_off:x - x_off + cols]
 
             # write tile
-            out_ds = gdal.Open(out_raster_path.as_posix(), gdal.GA_Update)
-            if out_raster_nr_of_bands == 1:  # one band
-                out_ds.GetRasterBand(1).WriteArray(visualization_array, x, y)
-                out_ds.FlushCache()
-            else:  # multiple bands
-                for i_band in range(out_raster_nr_of_bands):
-                    band = i_band + 1
-                    out_ds.GetRasterBand(band).WriteArray(visualization_array[i_band], x, y)
-                    out_ds.FlushCache()
-            out_ds = None
+            tile_writer.write(x, y, visualization_array)
+
     dem_ds = None
 
 
@@ -224,9 +310,13 @@ def _create_rvt_visualization_blank_raster(
         output_dir_path: Path,
         dem_ds: gdal.Dataset,
         save_float: bool,
-        save_8bit: bool
+        save_8bit: bool,
+        block_size_x: int = 512,
+        block_size_y: int = 512
 ) -> None:
-    """"Create blank raster or rasters for rvt_visualization to later store visualization in it tile by tile."""
+    """"Create blank raster or rasters for rvt_visualization to later store visualization in it tile by tile.
+    Rasters are tiled in blocks (block_size_x, block_size_y) and compressed as set in rvt_default (tile_compress,
+    tile_compress_threads)."""
     if save_float:
         out_float_path = rvt_default.get_visualization_path(
             rvt_visualization=rvt_visualization,
@@ -237,11 +327,16 @@ def _create_rvt_visualization_blank_raster(
         nr_bands = 1
         if rvt_visualization == rvt.default.RVTVisualization.MULTI_HILLSHADE:
             nr_bands = rvt_default.mhs_nr_dir
+        elif rvt_visualization == rvt.default.RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION:
+            nr_bands = 3
         _create_blank_raster(
             in_data_set=dem_ds,
             out_raster_path=out_float_path,
             nr_bands=nr_bands,
-            e_type=6)
+            e_type=6,
+            creation_options=_get_creation_options(e_type=6, nr_bands=nr_bands, block_size_x=block_size_x,
+                                                   block_size_y=block_size_y, compress=rvt_default.tile_compress,
+                                                   num_threads=rvt_default.tile_compress_threads))
     if save_8bit:
         out_8bit_path = rvt_default.get_visualization_path(
             rvt_visualization=rvt_visualization,
@@ -257,7 +352,10 @@ def _create_rvt_visualization_blank_raster(
             in_data_set=dem_ds,
             out_raster_path=out_8bit_path,
             nr_bands=nr_bands,
-            e_type=1)
+            e_type=1,
+            creation_options=_get_creation_options(e_type=1, nr_bands=nr_bands, block_size_x=block_size_x,
+                                                   block_size_y=block_size_y, compress=rvt_default.tile_compress,
+                                                   num_threads=rvt_default.tile_compress_threads))
 
 
 def _get_rvt_visualization_overlap(
@@ -268,7 +366,7 @@ def _get_rvt_visualization_overlap(
     elif rvt_visualization == rvt.default.RVTVisualization.HILLSHADE:
         return 1
     elif rvt_visualization == rvt.default.RVTVisualization.SHADOW:
-        return 1
+        return 100  # max_shadow_dist of rvt.vis.shadow_horizon
     elif rvt_visualization == rvt.default.RVTVisualization.MULTI_HILLSHADE:
         return 1
     elif rvt_visualization == rvt.default.RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL:
@@ -288,215 +386,601 @@ def _get_rvt_visualization_overlap(
     elif rvt_visualization == rvt.default.RVTVisualization.MULTI_SCALE_RELIEF_MODEL:
         return int(rvt_default.msrm_feature_max)
     elif rvt_visualization == rvt.default.RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION:
-        return int(rvt_default.mstp_broad_scale[1])
+        if not rvt_default.mstp_multi_resolution:
+            return int(rvt_default.mstp_broad_scale[1])
+        # Decimated scales (see rvt.vis.mstp) are computed on block means and bilinearly upsampled. Output pixel is
+        # interpolated from 2 neighbouring blocks, deviations of the blocks need blocks within the decimated maximal
+        # radius, so overlap is (radius + 2) blocks, which is not smaller than the maximal radius in DEM pixels (the
+        # halo shrinks only in pixels of the decimated DEM). Overlap is a multiple of the largest decimation, so blocks
+        # of tiles are the same as blocks of the whole DEM (tile offsets are multiples of the output block size, see
+        # _align_tile_size, which is a multiple of the decimation up to the block size).
+        overlap = int(rvt_default.mstp_local_scale[1])
+        max_decimation = 1
+        for scale in (rvt_default.mstp_meso_scale, rvt_default.mstp_broad_scale):
+            decimation, (_, maximum_radius, _) = rvt.vis.mstp_scale_decimation(scale)
+            overlap = max(overlap, (maximum_radius + 2) * decimation)
+            max_decimation = max(max_decimation, decimation)
+        return -(-overlap // max_decimation) * max_decimation
+
+
+def get_available_memory() -> Optional[int]:
+    """Returns available system memory in bytes (psutil if installed, else os.sysconf), None if it is unknown."""
+    if psutil is not None:
+        return int(psutil.virtual_memory().available)
+    try:
+        return int(os.sysconf("SC_AVPHYS_PAGES")) * int(os.sysconf("SC_PAGE_SIZE"))
+    except (AttributeError, ValueError, OSError):  # os.sysconf doesn't exist (Windows) or is not supported
+        return None
+
+
+def _is_horizon_visualization(rvt_visualization: "rvt.default.RVTVisualization") -> bool:
+    """Returns True if rvt_visualization is computed by the horizon search (rvt.vis.sky_view_factor)."""
+    return rvt_visualization in (rvt.default.RVTVisualization.SKY_VIEW_FACTOR,
+                                 rvt.default.RVTVisualization.ANISOTROPIC_SKY_VIEW_FACTOR,
+                                 rvt.default.RVTVisualization.POSITIVE_OPENNESS,
+                                 rvt.default.RVTVisualization.NEGATIVE_OPENNESS)
+
+
+# Memory cost model of RVT visualizations (get_rvt_visualization_memory), bytes per pixel of the DEM (tile with
+# overlap) or of the DEM padded for the search radius. Values were measured (peak of numpy allocations, numpy 2) and
+# are the sum of the arrays which are alive at the peak, float32 is 4 bytes, float64 and int64 are 8, bool is 1.
+# Float32 DEM copy (no_data and ve_factor), its NaN mask and x and y derivatives (aspect is the second output of
+# slope_aspect), padded float32 DEM and mask of zero y derivatives
+_SLOPE_BYTES = 4 + 1 + 4 + 4 + 4 + 1
+# Float32 DEM copies (no_data and ve_factor), slope and aspect (float32) and up to 6 float32 temporaries of the
+# hillshade formula (cosine and sine of slope, aspect - azimuth and its cosine, products)
+_HILLSHADE_BYTES = 2 * 4 + 2 * 4 + 6 * 4
+# Float32 elevation in pixel units and its padded copy, maximal slope, its arctan and horizon in degrees (float32),
+# NaN and shadow masks (bool) and shadow (int64)
+_SHADOW_BYTES = 4 + 4 + 4 + 4 + 4 + 1 + 1 + 8
+# Float32 DEM copies, slope and aspect and six float32 planes (flat, slope, cosine and sine planes, cosine of aspect
+# and scratch) from which the hillshades of all directions are summed
+_MULTI_HILLSHADE_BYTES = 2 * 4 + 2 * 4 + 6 * 4
+# Float32 DEM copies, summed area table (float64, see rvt.vis.SummedAreaTable) and mean filtered DEM (float64 mean,
+# its float32 copy and NaN mask)
+_SLRM_BYTES = 2 * 4 + 8 + 8 + 4 + 1
+# Horizon search (rvt.vis.sky_view_factor_compute): NaN mask, float32 DEM in pixel units, float64 output and its copy
+# when directions are averaged (openness is converted to degrees on one more copy)
+_HORIZON_BYTES = 1 + 4 + 8 + 8
+_HORIZON_OPENNESS_BYTES = 8
+# Float32 DEM padded by svf_r_max
+_HORIZON_PADDED_BYTES = 4
+# Each worker thread: maximal (or minimal) slope and scratch (float64)
+_HORIZON_WORKER_BYTES = 8 + 8
+# Each worker thread when radii above _HORIZON_PRUNE_RADIUS are pruned (rvt.vis.horizon_scan): active mask, bound of
+# slopes (float64) and, for up to 30 % active pixels, their line, column and flat indexes and a temporary of the flat
+# index (int64), gathered heights (float32) and slopes (float64)
+_HORIZON_PRUNE_BYTES = 1 + 8 + 0.3 * (4 * 8 + 2 * 4 + 2 * 8)
+_HORIZON_PRUNE_RADIUS = 16
+# Pyramid search (search_mode "pyramid"): radii above _PYRAMID_FINE_RADIUS are searched on the levels of the
+# max-pooled elevation, every level is upsampled to the padded DEM (float32), one more level sized array is
+# allocated while a level is upsampled
+_PYRAMID_LEVEL_PADDED_BYTES = 4
+_PYRAMID_FINE_RADIUS = 32
+# Sweep search (search_mode "sweep"): radii above _SWEEP_NEAR_RADIUS are searched along digital lines
+# (rvt.vis.horizon_sweep). Each worker thread keeps elevation along the lines (float32) and slopes of the lines
+# (float64) for every pixel of the lines, then either the hulls (stack item is position (int64), height (float32),
+# edge slope and intercept (float64), at most _SWEEP_MAX_HULL_SIZE items) or slopes moved back to rows and columns
+# (float64) with their line indexes (int64)
+_SWEEP_LINE_BYTES = 4 + 8
+_SWEEP_HULL_ITEM_BYTES = 8 + 4 + 8 + 8
+_SWEEP_MAX_HULL_SIZE = 2 ** 22
+_SWEEP_MAP_BYTES = 8 + 8
+_SWEEP_NEAR_RADIUS = 10
+# Sky illumination: slope and aspect of the DEM padded by 20 pixels, elevation pyramid padded for the search (wrap),
+# work arrays of the horizon search on the levels and float32 uniform and overcast sums of the padded DEM (measured)
+_SKY_ILLUMINATION_BYTES = 130
+# Shadow, horizon, uniform and overcast illumination with shadow (float32) and temporaries of combining them
+_SKY_ILLUMINATION_SHADOW_BYTES = 4 * 4 + 2 * 4
+# Float32 DEM, its padded copy scaled by ve_factor, observer elevation, accumulated dominance and the normalized copy
+_LOCAL_DOMINANCE_BYTES = 4 * 4
+# Float32 DEM copies, summed area table (float64), two mean filtered DEMs (float32, computed in float64) and their
+# float64 difference
+_MSRM_BYTES = 2 * 4 + 8 + 2 * 4 + 8
+# Float32 DEM, three float64 scratch arrays of topographic deviations (see rvt.vis.topographic_dev) and deviations of
+# the three scales (float32)
+_MSTP_BYTES = 4 + 3 * 8 + 3 * 4
+# Summed area tables of elevation and squared elevation (float64), float32 DEM padded by the largest radius of the
+# scale and its NaN mask
+_MSTP_PADDED_BYTES = 8 + 8 + 4 + 1
+
+
+def get_rvt_visualization_memory(
+        rvt_visualization: "rvt.default.RVTVisualization",
+        rvt_default: "rvt.default.DefaultValues",
+        x_size: int,
+        y_size: int
+) -> Tuple[int, int]:
+    """
+    Memory cost model of RVT visualization. Returns estimated memory (in bytes) of computing rvt_visualization
+    (with rvt_default parameters) on DEM (float32) of x_size columns and y_size rows, without DEM itself.
+    Bytes per pixel were measured (peak of numpy allocations) with float and 8bit output and numpy 2 (horizon slopes
+    of Sky-View Factor and Openness are float64, see rvt.vis.sky_view_factor_compute), they are the sums of the work
+    arrays of the algorithms (see the constants of this module).
 
+    Parameters
+    ----------
+    rvt_visualization : RVTVisualization
+        RVT visualization.
+    rvt_default : Default
+        Class where RVT parameters are stored.
+    x_size : int
+        Number of columns of DEM (tile with overlap).
+    y_size : int
+        Number of rows of DEM (tile with overlap).
 
-def save_rvt_visualization_tile_by_tile(
-        rvt_visualization: "rvt.default.RVTVisualization",
+    Returns
+    -------
+    out : tuple(output_bytes, working_bytes)
+        Memory of float and 8bit results (kept until the results are saved) and working memory (temporary arrays,
+        freed when visualization is computed).
+    """
+    nr_pixels = x_size * y_size
+    output_bytes_per_pixel = 4 + 1  # float32 and uint8 band
+    workers = max(int(rvt_default.workers), 1)
+    if rvt_visualization == rvt.default.RVTVisualization.SLOPE:
+        working_bytes_per_pixel = _SLOPE_BYTES
+    elif rvt_visualization == rvt.default.RVTVisualization.HILLSHADE:
+        working_bytes_per_pixel = _HILLSHADE_BYTES
+    elif rvt_visualization == rvt.default.RVTVisualization.SHADOW:
+        working_bytes_per_pixel = _SHADOW_BYTES
+    elif rvt_visualization == rvt.default.RVTVisualization.MULTI_HILLSHADE:
+        output_bytes_per_pixel = 4 * int(rvt_default.mhs_nr_dir) + 3  # float band per direction, 8bit RGB
+        working_bytes_per_pixel = _MULTI_HILLSHADE_BYTES
+    elif rvt_visualization == rvt.default.RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL:
+        working_bytes_per_pixel = _SLRM_BYTES
+    elif _is_horizon_visualization(rvt_visualization):
+        radius = int(rvt_default.svf_r_max)
+        nr_padded_pixels = (x_size + 2 * radius) * (y_size + 2 * radius)
+        search_mode = rvt_default.svf_search_mode
+        # radii searched by shifts on the original resolution
+        shift_radius = radius
+        if search_mode == "pyramid":
+            shift_radius = min(radius, _PYRAMID_FINE_RADIUS)
+        elif search_mode == "sweep":
+            shift_radius = min(radius, _SWEEP_NEAR_RADIUS)
+        worker_bytes = _HORIZON_WORKER_BYTES * nr_pixels
+        if shift_radius > _HORIZON_PRUNE_RADIUS:
+            worker_bytes += _HORIZON_PRUNE_BYTES * nr_pixels
+        working_bytes = _HORIZON_BYTES * nr_pixels + _HORIZON_PADDED_BYTES * nr_padded_pixels
+        if rvt_visualization == rvt.default.RVTVisualization.POSITIVE_OPENNESS or \
+                rvt_visualization == rvt.default.RVTVisualization.NEGATIVE_OPENNESS:
+            working_bytes += _HORIZON_OPENNESS_BYTES * nr_pixels
+        if search_mode == "pyramid" and radius > _PYRAMID_FINE_RADIUS:
+            nr_levels = int(np.ceil(np.log2(radius / _PYRAMID_FINE_RADIUS)))
+            working_bytes += _PYRAMID_LEVEL_PADDED_BYTES * (nr_levels + 1) * nr_padded_pixels
+        elif search_mode == "sweep" and radius > _SWEEP_NEAR_RADIUS:
+            # lines of the diagonal directions: every column and row starts a line, lines are longer by the radius
+            nr_lines = x_size + y_size
+            nr_line_pixels = nr_lines * (max(x_size, y_size) + radius)
+            nr_hull_items = min(nr_lines * (radius + 2), max(_SWEEP_MAX_HULL_SIZE, 256 * (radius + 2)))
+            worker_bytes += _SWEEP_LINE_BYTES * nr_line_pixels + max(_SWEEP_HULL_ITEM_BYTES * nr_hull_items,
+                                                                    _SWEEP_MAP_BYTES * nr_pixels)
+        return output_bytes_per_pixel * nr_pixels, int(working_bytes + workers * worker_bytes)
+    elif rvt_visualization == rvt.default.RVTVisualization.SKY_ILLUMINATION:
+        working_bytes_per_pixel = _SKY_ILLUMINATION_BYTES
+        if rvt_default.sim_compute_shadow:
+            working_bytes_per_pixel += _SKY_ILLUMINATION_SHADOW_BYTES
+    elif rvt_visualization == rvt.default.RVTVisualization.LOCAL_DOMINANCE:
+        working_bytes_per_pixel = _LOCAL_DOMINANCE_BYTES
+    elif rvt_visualization == rvt.default.RVTVisualization.MULTI_SCALE_RELIEF_MODEL:
+        working_bytes_per_pixel = _MSRM_BYTES
+    elif rvt_visualization == rvt.default.RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION:
+        output_bytes_per_pixel = 3 * (4 + 1)  # RGB
+        # summed area tables are built for the scales of each decimation (see rvt.vis.mstp, decimation is 1 without
+        # multi_resolution) on the decimated DEM padded by their largest radius, one decimation after another
+        level_padding = {1: int(rvt_default.mstp_local_scale[1])}
+        for scale in (rvt_default.mstp_meso_scale, rvt_default.mstp_broad_scale):
+            decimation, (_, maximum_radius, _) = rvt.vis.mstp_scale_decimation(
+                scale, multi_resolution=bool(rvt_default.mstp_multi_resolution))
+            level_padding[decimation] = max(level_padding.get(decimation, 0), maximum_radius)
+        nr_padded_pixels = max((-(-x_size // decimation) + 2 * padding) * (-(-y_size // decimation) + 2 * padding)
+                               for decimation, padding in level_padding.items())
+        working_bytes = _MSTP_BYTES * nr_pixels + _MSTP_PADDED_BYTES * nr_padded_pixels
+        return output_bytes_per_pixel * nr_pixels, working_bytes
+    else:
+        raise Exception("rvt.tile.get_rvt_visualization_memory: Wrong rvt_visualization!")
+    return output_bytes_per_pixel * nr_pixels, working_bytes_per_pixel * nr_pixels
+
+
+def estimate_rvt_visualizations_memory(
+        rvt_visualizations: List["rvt.default.RVTVisualization"],
+        rvt_default: "rvt.default.DefaultValues",
+        x_size: int,
+        y_size: int,
+        memory_limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Estimates memory of computing rvt_visualizations (together, see DefaultValues.calculate_visualizations) on DEM of
+    x_size columns and y_size rows in memory and tile by tile (see get_rvt_visualization_memory) and chooses between
+    them. If rvt_default.tile_auto, DEM is computed in memory if it fits in memory_limit, else tile by tile with the
+    largest square tile (multiple of rvt_default.tile_block_size) which fits in memory_limit with
+    rvt_default.tile_workers workers and tiles waiting to be written (tiles smaller than a block down to 64 pixels, with
+    a warning if even that doesn't fit). If not rvt_default.tile_auto or memory_limit is unknown,
+    rvt_default.tile_size_limit and rvt_default.tile_size are used. Nothing is computed, so it can be used to plan
+    jobs.
+
+    Parameters
+    ----------
+    rvt_visualizations : list(RVTVisualization)
+        RVT visualizations.
+    rvt_default : Default
+        Class where RVT parameters are stored.
+    x_size : int
+        Number of columns of DEM.
+    y_size : int
+        Number of rows of DEM.
+    memory_limit : int
+        Memory (in bytes) available for computation when rvt_default.tile_auto. If None it is
+        rvt_default.memory_limit or if it is also None rvt_default.memory_fraction of available system memory
+        (get_available_memory).
+
+    Returns
+    -------
+    out : dict
+        Dictionary with keys: "in_memory_bytes" (estimated memory of computing in memory), "memory_limit" (None if
+        not tile_auto or unknown), "tile_by_tile" (bool), "tile_size" (tuple(x_size, y_size)), "overlap" and
+        "tile_by_tile_bytes" (estimated memory of computing tile by tile with tile_size).
+    """
+    if not rvt_default.tile_auto:
+        memory_limit = None
+    elif memory_limit is None:
+        memory_limit = rvt_default.memory_limit
+    if rvt_default.tile_auto and memory_limit is None:
+        available_memory = get_available_memory()
+        if available_memory is not None:
+            memory_limit = int(available_memory * rvt_default.memory_fraction)
+
+    # horizon visualizations are computed in one search, each of them has a float64 output array during the search
+    nr_horizon_visualizations = sum(_is_horizon_visualization(rvt_visualization)
+                                    for rvt_visualization in rvt_visualizations)
+
+    def computation_bytes(cols, rows):  # DEM, results of all visualizations and the largest working memory
+        visualizations_memory = [get_rvt_visualization_memory(rvt_visualization=rvt_visualization,
+                                                              rvt_default=rvt_default, x_size=cols, y_size=rows)
+                                 for rvt_visualization in rvt_visualizations]
+        horizon_bytes = 8 * max(nr_horizon_visualizations - 1, 0) * cols * rows
+        return 4 * cols * rows + sum(output_bytes for output_bytes, _ in visualizations_memory) + \
+            max((working_bytes + horizon_bytes * _is_horizon_visualization(rvt_visualization)
+                 for rvt_visualization, (_, working_bytes) in zip(rvt_visualizations, visualizations_memory)),
+                default=0)
+
+    overlap = max((_get_rvt_visualization_overlap(rvt_visualization=rvt_visualization, rvt_default=rvt_default)
+                   for rvt_visualization in rvt_visualizations), default=0)
+    tile_workers = max(int(rvt_default.tile_workers), 1)
+    max_in_flight = rvt_default.tile_max_in_flight
+    if max_in_flight is None:
+        max_in_flight = 2 * tile_workers
+    output_bytes_per_pixel = sum(get_rvt_visualization_memory(rvt_visualization=rvt_visualization,
+                                                              rvt_default=rvt_default, x_size=1, y_size=1)[0]
+                                 for rvt_visualization in rvt_visualizations)
+
+    def tile_by_tile_bytes(tile_size_x, tile_size_y):  # computing workers, tiles waiting for write (_TileWriter)
+        cols = min(tile_size_x + 2 * overlap, x_size)
+        rows = min(tile_size_y + 2 * overlap, y_size)
+        waiting_tiles = max(max_in_flight - tile_workers, 0) + 2
+        return tile_workers * computation_bytes(cols, rows) + \
+            waiting_tiles * output_bytes_per_pixel * tile_size_x * tile_size_y
+
+    in_memory_bytes = computation_bytes(x_size, y_size)
+    if memory_limit is None:  # fixed limit and tile size
+        tile_by_tile = x_size * y_size > rvt_default.tile_size_limit
+        tile_size = tuple(rvt_default.tile_size)
+    else:
+        tile_by_tile = in_memory_bytes > memory_limit
+        block_size = _align_tile_size(tile_size=max(x_size, y_size), block_size=rvt_default.tile_block_size)[1]
+        tile_size = block_size
+        while tile_size < max(x_size, y_size) and \
+                tile_by_tile_bytes(tile_size + block_size, tile_size + block_size) <= memory_limit:
+            tile_size += block_size
+        # one block doesn't fit, smaller tiles (and blocks, see _align_tile_size)
+        while tile_size > 64 and tile_by_tile_bytes(tile_size, tile_size) > memory_limit:
+            tile_size = max(tile_size // 2 // 16 * 16, 64)
+        if tile_by_tile_bytes(tile_size, tile_size) > memory_limit:
+            warnings.warn("rvt.tile.estimate_rvt_visualizations_memory: Even the smallest tile ({0} x {0} pixels, "
+                          "{1:.1f} MB) doesn't fit in memory limit ({2:.1f} MB)!".format(
+                              tile_size, tile_by_tile_bytes(tile_size, tile_size) / 2 ** 20, memory_limit / 2 ** 20))
+        tile_size = (tile_size, tile_size)
+    return {
+        "in_memory_bytes": in_memory_bytes,
+        "memory_limit": memory_limit,
+        "tile_by_tile": tile_by_tile,
+        "tile_size": tile_size,
+        "overlap": overlap,
+        "tile_by_tile_bytes": tile_by_tile_bytes(*tile_size)
+    }
+
+
+def _get_tile_windows(
+        x_size: int,
+        y_size: int,
+        tile_size_x: int,
+        tile_size_y: int,
+        overlap: int
+) -> Iterator[Tuple[int, int, int, int, int, int, int, int]]:
+    """Yields windows of tiles (row by row) as tuple (x, y, cols, rows, x_off, y_off, cols_off, rows_off). Tile
+    (x, y, cols, rows) is the part written to the output, window (x_off, y_off, cols_off, rows_off) is the tile with
+    overlap (clipped at the raster edges) read from the DEM."""
+    for y in range(0, y_size, tile_size_y):
+        rows = min(tile_size_y, y_size - y)
+        for x in range(0, x_size, tile_size_x):
+            cols = min(tile_size_x, x_size - x)
+            x_off = max(x - overlap, 0)
+            y_off = max(y - overlap, 0)
+            cols_off = min(x + cols + overlap, x_size) - x_off
+            rows_off = min(y + rows + overlap, y_size) - y_off
+            yield x, y, cols, rows, x_off, y_off, cols_off, rows_off
+
+
+# state of the tile worker process (set once per pool worker process by _init_rvt_visualization_tile_worker)
+_tile_worker = {}
+
+
+def _set_tile_worker_executable() -> None:
+    """Tile worker processes are spawned (not forked), they run sys.executable. When RVT runs in an application with
+    embedded python (e.g. QGIS) this is the application itself, so python interpreter of the embedded python (in
+    sys.exec_prefix) is set for multiprocessing. Raises exception if it is not found."""
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        return
+    python_names = ["python.exe", "python3.exe", "python{}.{}".format(*sys.version_info[:2]), "python3", "python"]
+    python_dirs = [sys.exec_prefix, os.path.join(sys.exec_prefix, "bin"), os.path.dirname(sys.executable)]
+    for python_dir in python_dirs:
+        for python_name in python_names:
+            python_path = os.path.join(python_dir, python_name)
+            if os.path.isfile(python_path):
+                multiprocessing.set_executable(python_path)
+                return
+    raise Exception("rvt.tile._set_tile_worker_executable: Python interpreter for tile workers not found ({} is not"
+                    " python), use tile_workers = 1!".format(sys.executable))
+
+
+def _open_rvt_visualization_tile_worker(
+        rvt_visualizations: List["rvt.default.RVTVisualization"],
+        rvt_default: "rvt.default.DefaultValues",
+        dem_path: Path,
+        save_float: List[bool],
+        save_8bit: List[bool]
+) -> Dict[str, Any]:
+    """Opens DEM and returns state of the tile worker (parameters and DEM data set, closed when state is deleted)."""
+    dem_ds = gdal.Open(dem_path.as_posix())
+    gt = dem_ds.GetGeoTransform()
+    return dict(
+        rvt_visualizations=rvt_visualizations,
+        rvt_default=rvt_default,
+        dem_ds=dem_ds,
+        x_res=gt[1],  # x_resolution
+        y_res=-gt[5],  # y_resolution
+        no_data=dem_ds.GetRasterBand(1).GetNoDataValue(),
+        save_float=save_float,
+        save_8bit=save_8bit
+    )
+
+
+def _init_rvt_visualization_tile_worker(*args) -> None:
+    """Initializer of pool worker processes, stores state of the tile worker (see _open_rvt_visualization_tile_worker
+    for args) in _tile_worker."""
+    _tile_worker.clear()
+    _tile_worker.update(_open_rvt_visualization_tile_worker(*args))
+
+
+def _compute_rvt_visualization_tile(
+        window: Tuple[int, int, int, int, int, int, int, int],
+        tile_worker: Dict[str, Any]
+) -> Tuple[Any, ...]:
+    """Reads window (output of _get_tile_windows) from DEM of tile_worker (output of
+    _open_rvt_visualization_tile_worker) once, computes all visualizations on it (sharing slope, aspect and horizon
+    search, see DefaultValues.calculate_visualizations) and removes overlap.
+    Returns (x, y, visualization_1_float_arr, visualization_1_8bit_arr, visualization_2_float_arr, ...)."""
+    x, y, cols, rows, x_off, y_off, cols_off, rows_off = window
+    tile_array = np.array(tile_worker["dem_ds"].GetRasterBand(1).ReadAsArray(x_off, y_off, cols_off, rows_off))
+
+    rvt_default = tile_worker["rvt_default"]
+    with rvt_default.cache_derivatives():
+        visualizations_arrs = rvt_default.calculate_visualizations(
+            visualizations=tile_worker["rvt_visualizations"],
+            dem=tile_array,
+            resolution_x=tile_worker["x_res"],
+            resolution_y=tile_worker["y_res"],
+            no_data=tile_worker["no_data"],
+            save_float=tile_worker["save_float"],
+            save_8bit=tile_worker["save_8bit"]
+        )
+
+    # remove offset from visualization blocks (last two axes, also for multiple bands)
+    top_offset = y - y_off
+    left_offset = x - x_off
+    tile = [x, y]
+    for visualization_float_arr, visualization_8bit_arr in visualizations_arrs:
+        for visualization_arr in (visualization_float_arr, visualization_8bit_arr):
+            if visualization_arr is not None:
+                visualization_arr = visualization_arr[..., top_offset:top_offset + rows, left_offset:left_offset + cols]
+            tile.append(visualization_arr)
+    return tuple(tile)
+
+
+def _compute_rvt_visualization_tile_in_worker(
+        window: Tuple[int, int, int, int, int, int, int, int]
+) -> Tuple[Any, ...]:
+    """Computes window in pool worker process, with state set by _init_rvt_visualization_tile_worker."""
+    return _compute_rvt_visualization_tile(window, _tile_worker)
+
+
+def save_rvt_visualizations_tile_by_tile(
+        rvt_visualizations: List["rvt.default.RVTVisualization"],
         rvt_default: "rvt.default.DefaultValues",
         dem_path: Path,
         output_dir_path: Optional[Path] = None,
-        save_float: bool = True,
-        save_8bit: bool = False
+        save_float: Union[bool, List[bool]] = True,
+        save_8bit: Union[bool, List[bool]] = False
 ) -> None:
     """
-    Some DEMs are too large to load them into memory. This function reads dem raster tile by tile,
-    calculates RVT visualization on it tile by tile and than saves calculated visualization tile by tile in out raster.
-    This function can silmultaniously store float and 8bit version of visualization (where possible).
+    Some DEMs are too large to load them into memory. This function reads dem raster tile by tile (each tile once,
+    with the largest overlap needed by rvt_visualizations), calculates all RVT visualizations on it (slope, aspect and
+    horizon search are shared between visualizations of the tile) and saves each visualization tile by tile in its
+    own out raster. This function can silmultaniously store float and 8bit version of visualizations (where possible).
+    If rvt_default.tile_workers > 1 tiles are computed in parallel by spawned worker processes (each opens DEM and
+    reads its own window with overlap), at most rvt_default.tile_max_in_flight tiles are computed or waiting to be
+    written at once and results are written by this process only. Output rasters stay open during the run and tiles
+    are written by a writer thread (_TileWriter), so computation and writing overlap. Output rasters are tiled GTiffs (blocks of
+    rvt_default.tile_block_size) compressed with rvt_default.tile_compress, tile size is rounded up to a multiple of
+    block size so each tile is written in whole blocks. If rvt_default.tile_auto, tile size is chosen by memory cost
+    model (estimate_rvt_visualizations_memory) instead of rvt_default.tile_size.
 
     Parameters
     ----------
-    rvt_visualization : RVTVisualization
-        RVT visualization.
+    rvt_visualizations : list(RVTVisualization)
+        RVT visualizations.
     rvt_default : Default
         Class where RVT parameters are stored.
     dem_path : Path
         Path to a Digital elevation model.
     output_dir_path : Path
         Out directory to save visualizations. If None it uses dem_dir from dem_path.
-    save_float : bool
-        If save float.
-    save_8bit : bool
-        If save 8bit.
+    save_float : bool or list(bool)
+        If save float, for all or for each of rvt_visualizations.
+    save_8bit : bool or list(bool)
+        If save 8bit, for all or for each of rvt_visualizations.
 
     Returns
     -------
     out : None
     """
-    if not save_float and not save_8bit:
-        Exception("rvt.tile.save_visualization_tile_by_tile: At least one of save_float or save_8bit must be true!")
+    if isinstance(save_float, bool):
+        save_float = [save_float] * len(rvt_visualizations)
+    if isinstance(save_8bit, bool):
+        save_8bit = [save_8bit] * len(rvt_visualizations)
+    if len(save_float) != len(rvt_visualizations) or len(save_8bit) != len(rvt_visualizations):
+        raise Exception("rvt.tile.save_rvt_visualizations_tile_by_tile: save_float and save_8bit need one value for"
+                        " each of rvt_visualizations!")
+    if not any(save_float) and not any(save_8bit):
+        raise Exception("rvt.tile.save_rvt_visualizations_tile_by_tile: At least one of save_float or save_8bit must"
+                        " be true!")
     if not dem_path.exists():
-        Exception("rvt.tile.save_visualization_tile_by_tile: Input dem path does not exist!")
-
-    tile_size_x = rvt_default.tile_size[0]
-    tile_size_y = rvt_default.tile_size[1]
-
-    if tile_size_x < 50 or tile_size_y < 50:
-        Exception("rvt.tile.save_visualization_tile_by_tile: Tile size too small (tile_size_x, tile_size_y),"
-                  " it needs to be bigger than 50 pixels!")
+        raise Exception("rvt.tile.save_rvt_visualizations_tile_by_tile: Input dem path does not exist!")
 
     if output_dir_path is None:
         output_dir_path = dem_path.parent
 
     dem_ds = gdal.Open(dem_path.as_posix())
-    gt = dem_ds.GetGeoTransform()
-    x_res = gt[1]  # x_resolution
-    y_res = -gt[5]  # y_resolution
-    no_data = dem_ds.GetRasterBand(1).GetNoDataValue()
     band = dem_ds.GetRasterBand(1)
     x_size = band.XSize  # number of columns
     y_size = band.YSize  # number of rows
 
-    _create_rvt_visualization_blank_raster(
-        rvt_visualization=rvt_visualization,
-        rvt_default=rvt_default,
-        dem_path=dem_path,
-        output_dir_path=output_dir_path,
-        dem_ds=dem_ds,
-        save_float=save_float,
-        save_8bit=save_8bit
-    )
+    if rvt_default.tile_auto:  # tile size from memory cost model
+        tile_size_x, tile_size_y = estimate_rvt_visualizations_memory(
+            rvt_visualizations=rvt_visualizations, rvt_default=rvt_default, x_size=x_size, y_size=y_size
+        )["tile_size"]
+    else:
+        tile_size_x = rvt_default.tile_size[0]
+        tile_size_y = rvt_default.tile_size[1]
 
-    overlap = _get_rvt_visualization_overlap(rvt_visualization=rvt_visualization, rvt_default=rvt_default)
+    if tile_size_x < 50 or tile_size_y < 50:
+        raise Exception("rvt.tile.save_rvt_visualizations_tile_by_tile: Tile size too small (tile_size_x,"
+                        " tile_size_y), it needs to be bigger than 50 pixels!")
 
-    for y in range(0, y_size, tile_size_y):
-        if y + tile_size_y < y_size:  # if rows overlap
-            rows = tile_size_y
-        else:
-            rows = y_size - y
-        for x in range(0, x_size, tile_size_x):
-            if x + tile_size_x < x_size:  # if cols overlap
-                cols = tile_size_x
-            else:
-                cols = x_size - x
-
-            # get offset for each tile, check edges
-            left_offset = 0
-            right_offset = 0
-            top_offset = 0
-            bottom_offset = 0
-            if x != 0:  # left offset
-                if x - overlap < 0:  # left overlap
-                    left_offset = x
-                else:
-                    left_offset = overlap
-            if x + cols != x_size:  # right offset
-                if x + cols + overlap > x_size:  # right overlap
-                    right_offset = x_size - x - cols
-                else:
-                    right_offset = overlap
-            if y != 0:  # apply top offset
-                if y - overlap < 0:  # top overlap
-                    top_offset = y
-                else:
-                    top_offset = overlap
-            if y + rows != y_size:  # bottom offset
-                if y + rows + overlap > y_size:  # bottom overlap
-                    bottom_offset = y_size - y - rows
-                else:
-                    bottom_offset = overlap
+    # tile grid aligned with blocks of output rasters
+    tile_size_x, block_size_x = _align_tile_size(tile_size=tile_size_x, block_size=rvt_default.tile_block_size)
+    tile_size_y, block_size_y = _align_tile_size(tile_size=tile_size_y, block_size=rvt_default.tile_block_size)
 
-            # read tile
-            x_off = x - left_offset
-            y_off = y - top_offset
-            cols_off = cols + left_offset + right_offset
-            rows_off = rows + top_offset + bottom_offset
+    out_raster_paths = []
+    for rvt_visualization, vis_save_float, vis_save_8bit in zip(rvt_visualizations, save_float, save_8bit):
+        _create_rvt_visualization_blank_raster(
+            rvt_visualization=rvt_visualization,
+            rvt_default=rvt_default,
+            dem_path=dem_path,
+            output_dir_path=output_dir_path,
+            dem_ds=dem_ds,
+            save_float=vis_save_float,
+            save_8bit=vis_save_8bit,
+            block_size_x=block_size_x,
+            block_size_y=block_size_y
+        )
+        out_raster_paths += [
+            rvt_default.get_visualization_path(rvt_visualization=rvt_visualization, dem_path=dem_path,
+                                               output_dir_path=output_dir_path, path_8bit=path_8bit) if save else None
+            for save, path_8bit in ((vis_save_float, False), (vis_save_8bit, True))
+        ]
+
+    overlap = max(_get_rvt_visualization_overlap(rvt_visualization=rvt_visualization, rvt_default=rvt_default)
+                  for rvt_visualization in rvt_visualizations)
+
+    tile_windows = _get_tile_windows(x_size=x_size, y_size=y_size, tile_size_x=tile_size_x,
+                                     tile_size_y=tile_size_y, overlap=overlap)
+    # workers get a copy without the derivative cache (it only holds arrays of the main process)
+    worker_default = copy.copy(rvt_default)
+    worker_default.derivative_cache = None
+    worker_args = (list(rvt_visualizations), worker_default, dem_path, list(save_float), list(save_8bit))
+
+    if rvt_default.tile_workers > 1:
+        _set_tile_worker_executable()
+        max_in_flight = rvt_default.tile_max_in_flight
+        if max_in_flight is None:
+            max_in_flight = 2 * rvt_default.tile_workers
+        # workers are spawned, forking a process with running writer thread and open GDAL data sets could copy locked
+        # GDAL mutexes into workers (deadlock)
+        with ProcessPoolExecutor(max_workers=rvt_default.tile_workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_rvt_visualization_tile_worker, initargs=worker_args) as executor, \
+                _TileWriter(out_raster_paths=out_raster_paths) as tile_writer:
+            in_flight = set()
+            for window in tile_windows:
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        tile_writer.write(*future.result())
+                in_flight.add(executor.submit(_compute_rvt_visualization_tile_in_worker, window))
+            for future in wait(in_flight).done:
+                tile_writer.write(*future.result())
+    else:
+        tile_worker = _open_rvt_visualization_tile_worker(*worker_args)
+        with _TileWriter(out_raster_paths=out_raster_paths) as tile_writer:
+            for window in tile_windows:
+                tile_writer.write(*_compute_rvt_visualization_tile(window, tile_worker))
+        tile_worker = None  # closes DEM
 
-            tile_array = np.array(dem_ds.GetRasterBand(1).ReadAsArray(x_off, y_off, cols_off, rows_off))
+    dem_ds = None
 
-            visualization_float_arr, visualization_8bit_arr = rvt_default.calculate_visualization(
-                visualization=rvt_visualization,
-                dem=tile_array,
-                resolution_x=x_res,
-                resolution_y=y_res,
-                no_data=no_data,
-                save_float=save_float,
-                save_8bit=save_8bit
-            )
-
-            # remove offset from visualization block
-            if save_float:
-                if visualization_float_arr.ndim == 2:
-                    if right_offset == 0 and bottom_offset == 0:
-                        visualization_float_arr = visualization_float_arr[top_offset:, left_offset:]
-                    elif right_offset == 0:
-                        visualization_float_arr = visualization_float_arr[top_offset:-bottom_offset, left_offset:]
-                    elif bottom_offset == 0:
-                        visualization_float_arr = visualization_float_arr[top_offset:, left_offset:-right_offset]
-                    else:
-                        visualization_float_arr = visualization_float_arr[
-                                                  top_offset:-bottom_offset, left_offset:-right_offset
-                                                  ]
-                else:
-                    if right_offset == 0 and bottom_offset == 0:
-                        visualization_float_arr = visualization_float_arr[:, top_offset:, left_offset:]
-                    elif right_offset == 0:
-                        visualization_float_arr = visualization_float_arr[:, top_offset:-bottom_offset, left_offset:]
-                    elif bottom_offset == 0:
-                        visualization_float_arr = visualization_float_arr[:, top_offset:, left_offset:-right_offset]
-                    else:
-                        visualization_float_arr = visualization_float_arr[
-                                                 :, top_offset:-bottom_offset, left_offset:-right_offset
-                                                 ]
-            if save_8bit:
-                if visualization_8bit_arr.ndim == 2:
-                    if right_offset == 0 and bottom_offset == 0:
-                        visualization_8bit_arr = visualization_8bit_arr[top_offset:, left_offset:]
-                    elif right_offset == 0:
-                        visualization_8bit_arr = visualization_8bit_arr[top_offset:-bottom_offset, left_offset:]
-                    elif bottom_offset == 0:
-                        visualization_8bit_arr = visualization_8bit_arr[top_offset:, left_offset:-right_offset]
-                    else:
-                        visualization_8bit_arr = visualization_8bit_arr[
-                                                  top_offset:-bottom_offset, left_offset:-right_offset
-                                                  ]
-                else:
-                    if right_offset == 0 and bottom_offset == 0:
-                        visualization_8bit_arr = visualization_8bit_arr[:, top_offset:, left_offset:]
-                    elif right_offset == 0:
-                        visualization_8bit_arr = visualization_8bit_arr[:, top_offset:-bottom_offset, left_offset:]
-                    elif bottom_offset == 0:
-                        visualization_8bit_arr = visualization_8bit_arr[:, top_offset:, left_offset:-right_offset]
-                    else:
-                        visualization_8bit_arr = visualization_8bit_arr[
-                                                 :, top_offset:-bottom_offset, left_offset:-right_offset
-                                                 ]
 
+def save_rvt_visualization_tile_by_tile(
+        rvt_visualization: "rvt.default.RVTVisualization",
+        rvt_default: "rvt.default.DefaultValues",
+        dem_path: Path,
+        output_dir_path: Optional[Path] = None,
+        save_float: bool = True,
+        save_8bit: bool = False
+) -> None:
+    """
+    Some DEMs are too large to load them into memory. This function reads dem raster tile by tile,
+    calculates RVT visualization on it tile by tile and than saves calculated visualization tile by tile in out raster.
+    This function can silmultaniously store float and 8bit version of visualization (where possible).
+    See save_rvt_visualizations_tile_by_tile (parallel computation, writing).
 
-            # write tile
-            if save_float:
-                out_visualization_float_path = rvt_default.get_visualization_path(
-                    rvt_visualization=rvt_visualization,
-                    dem_path=dem_path,
-                    output_dir_path=output_dir_path,
-                    path_8bit=False
-                )
-                out_ds_float = gdal.Open(out_visualization_float_path.as_posix(), gdal.GA_Update)
-                if visualization_float_arr.ndim == 2:
-                    out_ds_float.GetRasterBand(1).WriteArray(visualization_float_arr, x, y)
-                    out_ds_float.FlushCache()
-                else:
-                    for i_band in range(visualization_float_arr.shape[0]):
-                        band = i_band + 1
-                        out_ds_float.GetRasterBand(band).WriteArray(visualization_float_arr[i_band], x, y)
-                        out_ds_float.FlushCache()
-                out_ds_float = None
-            if save_8bit:  # multiple bands
-                out_visualization_8bit_path = rvt_default.get_visualization_path(
-                    rvt_visualization=rvt_visualization,
-                    dem_path=dem_path,
-                    output_dir_path=output_dir_path,
-                    path_8bit=True
-                )
-                out_ds_8bit = gdal.Open(out_visualization_8bit_path.as_posix(), gdal.GA_Update)
-                if visualization_8bit_arr.ndim == 2:
-                    out_ds_8bit.GetRasterBand(1).WriteArray(visualization_8bit_arr, x, y)
-                    out_ds_8bit.FlushCache()
-                else:
-                    for i_band in range(visualization_8bit_arr.shape[0]):
-                        band = i_band + 1
-                        out_ds_8bit.GetRasterBand(band).WriteArray(visualization_8bit_arr[i_band], x, y)
-                        out_ds_8bit.FlushCache()
-                out_ds_8bit = None
+    Parameters
+    ----------
+    rvt_visualization : RVTVisualization
+        RVT visualization.
+    rvt_default : Default
+        Class where RVT parameters are stored.
+    dem_path : Path
+        Path to a Digital elevation model.
+    output_dir_path : Path
+        Out directory to save visualizations. If None it uses dem_dir from dem_path.
+    save_float : bool
+        If save float.
+    save_8bit : bool
+        If save 8bit.
 
-    dem_ds = None
+    Returns
+    -------
+    out : None
+    """
+    if not save_float and not save_8bit:
+        raise Exception("rvt.tile.save_rvt_visualization_tile_by_tile: At least one of save_float or save_8bit must"
+                        " be true!")
+    save_rvt_visualizations_tile_by_tile(
+        rvt_visualizations=[rvt_visualization],
+        rvt_default=rvt_default,
+        dem_path=dem_path,
+        output_dir_path=output_dir_path,
+        save_float=[save_float],
+        save_8bit=[save_8bit]
+    )
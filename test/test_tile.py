@@ -0,0 +1,196 @@
+# coding=utf-8
+"""Tile by tile saving test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'ziga.kokalj@zrc-sazu.si'
+__date__ = '2020-10-12'
+__copyright__ = 'Copyright 2020, Research Centre of the Slovenian Academy of Sciences and Arts'
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from osgeo import gdal
+
+import rvt.default
+import rvt.tile
+
+
+class TileTest(unittest.TestCase):
+    """Test tile by tile saving."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.rng = np.random.default_rng(0)
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Runs after each test."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_get_tile_windows(self):
+        """Test that tiles cover the raster exactly once and windows add overlap clipped at the raster edges."""
+        x_size, y_size, overlap = 230, 170, 7
+        covered = np.zeros((y_size, x_size), dtype=int)
+        for x, y, cols, rows, x_off, y_off, cols_off, rows_off in rvt.tile._get_tile_windows(
+                x_size=x_size, y_size=y_size, tile_size_x=64, tile_size_y=48, overlap=overlap):
+            covered[y:y + rows, x:x + cols] += 1
+            self.assertTrue(cols <= 64 and rows <= 48)
+            self.assertEqual((x_off, y_off), (max(x - overlap, 0), max(y - overlap, 0)))
+            self.assertEqual(x_off + cols_off, min(x + cols + overlap, x_size))
+            self.assertEqual(y_off + rows_off, min(y + rows + overlap, y_size))
+        np.testing.assert_array_equal(covered, 1)
+
+    def test_align_tile_size(self):
+        """Test that block size is a multiple of 16 not larger than tile and tile is a multiple of block size."""
+        for tile_size, block_size in [(100, 512), (1000, 512), (1000, 300), (50, 10), (64, 64), (200, 17)]:
+            aligned_tile_size, aligned_block_size = rvt.tile._align_tile_size(tile_size, block_size)
+            self.assertEqual(aligned_block_size % 16, 0)
+            self.assertTrue(16 <= aligned_block_size <= -(-tile_size // 16) * 16)
+            self.assertEqual(aligned_tile_size % aligned_block_size, 0)
+            self.assertTrue(tile_size <= aligned_tile_size < tile_size + aligned_block_size)
+        self.assertEqual(rvt.tile._align_tile_size(1000, 512), (1024, 512))
+        self.assertEqual(rvt.tile._align_tile_size(100, 512), (112, 112))
+
+    def test_estimate_rvt_visualizations_memory(self):
+        """Test that automatic tile size fits in memory limit and that fixed settings are used without tile_auto."""
+        default = rvt.default.DefaultValues()
+        visualizations = [rvt.default.RVTVisualization.SLOPE, rvt.default.RVTVisualization.SKY_VIEW_FACTOR]
+        x_size, y_size = 3000, 2000
+        estimate = rvt.tile.estimate_rvt_visualizations_memory(visualizations, default, x_size, y_size)
+        self.assertEqual(estimate["tile_by_tile"], x_size * y_size > default.tile_size_limit)
+        self.assertEqual(estimate["tile_size"], tuple(default.tile_size))
+        self.assertEqual(estimate["overlap"], default.svf_r_max)
+
+        default.tile_auto = 1
+        in_memory_bytes = estimate["in_memory_bytes"]
+        estimate = rvt.tile.estimate_rvt_visualizations_memory(visualizations, default, x_size, y_size,
+                                                               memory_limit=2 * in_memory_bytes)
+        self.assertFalse(estimate["tile_by_tile"])
+        estimate = rvt.tile.estimate_rvt_visualizations_memory(visualizations, default, x_size, y_size,
+                                                               memory_limit=in_memory_bytes // 10)
+        self.assertTrue(estimate["tile_by_tile"])
+        self.assertTrue(estimate["tile_by_tile_bytes"] <= in_memory_bytes // 10)
+        self.assertEqual(estimate["tile_size"][0] % 16, 0)
+        # the largest tile that fits is chosen, a byte less memory needs a smaller tile
+        tile_size = estimate["tile_size"]
+        estimate = rvt.tile.estimate_rvt_visualizations_memory(visualizations, default, x_size, y_size,
+                                                               memory_limit=estimate["tile_by_tile_bytes"])
+        self.assertEqual(estimate["tile_size"], tile_size)
+        estimate = rvt.tile.estimate_rvt_visualizations_memory(visualizations, default, x_size, y_size,
+                                                               memory_limit=estimate["tile_by_tile_bytes"] - 1)
+        self.assertTrue(estimate["tile_size"][0] < tile_size[0])
+        self.assertTrue(estimate["tile_by_tile_bytes"] <= estimate["memory_limit"])
+        with self.assertWarns(UserWarning):
+            estimate = rvt.tile.estimate_rvt_visualizations_memory(visualizations, default, x_size, y_size,
+                                                                   memory_limit=2 ** 10)
+        self.assertEqual(estimate["tile_size"], (64, 64))
+        self.assertTrue(estimate["tile_by_tile_bytes"] > estimate["memory_limit"])
+
+        # longer search radius needs more memory
+        default.svf_r_max = 40
+        self.assertTrue(rvt.tile.estimate_rvt_visualizations_memory(visualizations, default, x_size, y_size,
+                                                                    memory_limit=2 ** 40)["in_memory_bytes"] >
+                        in_memory_bytes)
+
+    def test_get_rvt_visualization_memory(self):
+        """Test memory model terms of horizon search modes and multi-resolution MSTP."""
+        default = rvt.default.DefaultValues()
+        for visualization in rvt.default.RVTVisualization:
+            output_bytes, working_bytes = rvt.tile.get_rvt_visualization_memory(visualization, default, 300, 200)
+            self.assertTrue(output_bytes > 0 and working_bytes > 0)
+            self.assertTrue(working_bytes < rvt.tile.get_rvt_visualization_memory(visualization, default, 600, 400)[1])
+
+        def horizon_bytes(search_mode, radius, workers=1):
+            default.svf_search_mode = search_mode
+            default.svf_r_max = radius
+            default.workers = workers
+            return rvt.tile.get_rvt_visualization_memory(rvt.default.RVTVisualization.SKY_VIEW_FACTOR, default,
+                                                         1000, 1000)[1]
+        # short radii are searched the same way in all modes
+        self.assertEqual(horizon_bytes("pyramid", 30), horizon_bytes("shift", 30))
+        self.assertEqual(horizon_bytes("sweep", 10), horizon_bytes("shift", 10))
+        # upsampled pyramid levels, lines and hulls of the sweep, work arrays of each worker
+        self.assertTrue(horizon_bytes("pyramid", 300) > horizon_bytes("pyramid", 100) > horizon_bytes("shift", 100))
+        self.assertTrue(horizon_bytes("sweep", 300) > horizon_bytes("sweep", 100) > horizon_bytes("shift", 10))
+        for search_mode in ("shift", "pyramid", "sweep"):
+            self.assertTrue(horizon_bytes(search_mode, 100, workers=4) > horizon_bytes(search_mode, 100))
+
+        # decimated meso and broad scales are padded on the decimated DEM
+        mstp = rvt.default.RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION
+        full_bytes = rvt.tile.get_rvt_visualization_memory(mstp, default, 1000, 1000)[1]
+        default.mstp_multi_resolution = True
+        self.assertTrue(rvt.tile.get_rvt_visualization_memory(mstp, default, 1000, 1000)[1] < full_bytes)
+
+    def test_save_rvt_visualizations_tile_by_tile(self):
+        """Test that visualizations saved tile by tile equal visualizations computed on the whole DEM."""
+        dem = np.cumsum(np.cumsum(self.rng.normal(size=(150, 170)), axis=0), axis=1).astype(np.float32)
+        dem_path = os.path.join(self.temp_dir, "dem.tif")
+        dem_ds = gdal.GetDriverByName("GTiff").Create(dem_path, dem.shape[1], dem.shape[0], 1, gdal.GDT_Float32)
+        dem_ds.SetGeoTransform((0, 0.5, 0, 0, 0, -0.5))
+        dem_ds.GetRasterBand(1).WriteArray(dem)
+        dem_ds.FlushCache()
+        dem_ds = None
+
+        default = rvt.default.DefaultValues()
+        default.tile_size = (64, 56)
+        default.tile_block_size = 32
+        default.svf_r_max = 10
+        default.mstp_local_scale = (1, 5, 1)
+        default.mstp_meso_scale = (6, 12, 2)
+        default.mstp_broad_scale = (15, 30, 5)
+        visualizations = [rvt.default.RVTVisualization.SLOPE, rvt.default.RVTVisualization.MULTI_HILLSHADE,
+                          rvt.default.RVTVisualization.SKY_VIEW_FACTOR, rvt.default.RVTVisualization.POSITIVE_OPENNESS,
+                          rvt.default.RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION]
+        expected = default.calculate_visualizations(visualizations, dem, 0.5, 0.5, save_float=[True] * 5,
+                                                    save_8bit=[True] * 5)
+        # serial and in spawned worker processes
+        for tile_workers in [1, 2]:
+            default.tile_workers = tile_workers
+            rvt.tile.save_rvt_visualizations_tile_by_tile(visualizations, default, Path(dem_path),
+                                                          Path(self.temp_dir), save_float=True, save_8bit=True)
+            for visualization, expected_arrs in zip(visualizations, expected):
+                for path_8bit, expected_arr in zip((False, True), expected_arrs):
+                    out_path = default.get_visualization_path(visualization, Path(dem_path), Path(self.temp_dir),
+                                                              path_8bit=path_8bit)
+                    out_ds = gdal.Open(str(out_path))
+                    result = np.array([out_ds.GetRasterBand(i_band + 1).ReadAsArray()
+                                       for i_band in range(out_ds.RasterCount)])
+                    out_ds = None
+                    # rasters are float32 or byte, whole DEM results are compared after the same cast
+                    np.testing.assert_array_equal(np.squeeze(result), np.squeeze(expected_arr).astype(result.dtype))
+
+        # decimated meso and broad scales need overlap of block means and upsampling, blocks aligned with the whole DEM
+        default.tile_workers = 1
+        default.mstp_multi_resolution = True
+        default.mstp_meso_scale = (16, 24, 4)
+        default.mstp_broad_scale = (32, 50, 6)
+        visualization = rvt.default.RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION
+        rvt.tile.save_rvt_visualizations_tile_by_tile([visualization], default, Path(dem_path), Path(self.temp_dir))
+        expected = default.calculate_visualizations([visualization], dem, 0.5, 0.5, save_float=[True],
+                                                    save_8bit=[False])[0][0]
+        out_ds = gdal.Open(str(default.get_visualization_path(visualization, Path(dem_path), Path(self.temp_dir),
+                                                              path_8bit=False)))
+        result = np.array([out_ds.GetRasterBand(i_band + 1).ReadAsArray() for i_band in range(out_ds.RasterCount)])
+        out_ds = None
+        np.testing.assert_array_equal(result, expected.astype(result.dtype))
+
+        default.tile_size = (64, 40)
+        with self.assertRaises(Exception):
+            rvt.tile.save_rvt_visualizations_tile_by_tile(visualizations, default, Path(dem_path),
+                                                          Path(self.temp_dir))
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TileTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,320 @@
+# coding=utf-8
+"""Visualization functions test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'ziga.kokalj@zrc-sazu.si'
+__date__ = '2020-10-12'
+__copyright__ = 'Copyright 2020, Research Centre of the Slovenian Academy of Sciences and Arts'
+
+import unittest
+
+import numpy as np
+from scipy.interpolate import RectBivariateSpline
+from scipy.ndimage import gaussian_filter
+
+import rvt.vis
+
+
+class VisTest(unittest.TestCase):
+    """Test visualization functions."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        """Runs after each test."""
+        pass
+
+    def test_byte_scale(self):
+        """Test that multiband byte scale equals byte scale of each band and that input is not changed."""
+        data = self.rng.normal(size=(3, 40, 50)).astype(np.float32)
+        data[:, 5:10, 5:10] = np.nan
+        data[1, 0, 0] = -9999
+        data_copy = data.copy()
+        result = rvt.vis.byte_scale(data, no_data=-9999)
+        np.testing.assert_array_equal(data, data_copy)
+        self.assertEqual(result.dtype, np.uint8)
+        for i_band in range(3):
+            np.testing.assert_array_equal(result[i_band], rvt.vis.byte_scale(data[i_band], no_data=-9999))
+        self.assertEqual(result[1, 0, 0], 255)
+        self.assertEqual(result[0, 5, 5], 255)
+        self.assertEqual(rvt.vis.byte_scale(np.array([[0.0, 0.5, 1.0]]), c_min=0, c_max=1).tolist(), [[0, 127, 255]])
+        # uint8 data in the full range is not changed
+        data_uint8 = np.arange(256, dtype=np.uint8).reshape((16, 16))
+        np.testing.assert_array_equal(rvt.vis.byte_scale(data_uint8), data_uint8)
+
+    def test_bilinear_upsample(self):
+        """Test that bilinear upsampling equals the linear spline (also outside the coarse grid)."""
+        for scale in [2, 3, 4]:
+            for offset in [-3, 0, 5]:
+                data = self.rng.normal(size=(11, 8)).astype(np.float32)
+                out_shape = (11 * scale + 4, 8 * scale - 1)
+                interp_spline = RectBivariateSpline(np.arange(data.shape[0]) * scale,
+                                                    np.arange(data.shape[1]) * scale, data, kx=1, ky=1)
+                expected = interp_spline(np.arange(out_shape[0]) + offset, np.arange(out_shape[1]) + offset)
+                result = rvt.vis.bilinear_upsample(data, out_shape, scale, offset)
+                self.assertEqual(result.dtype, np.float32)
+                self.assertEqual(result.shape, expected.shape)
+                np.testing.assert_allclose(result, expected, rtol=0, atol=1e-6)
+
+    def test_sky_view_factor_np_roll(self):
+        """Test that horizon search equals the original np.roll implementation (same dtype and values)."""
+        height_arr = np.cumsum(self.rng.normal(size=(70, 80)), axis=0).astype(np.float32)
+        height_arr[30:34, 40:45] = np.nan
+        radius_max = 30
+        num_directions = 8
+        height = np.pad(height_arr, radius_max, mode="reflect")
+        move = rvt.vis.horizon_shift_vector(num_directions=num_directions, radius_pixels=radius_max)
+        svf_out = height * 0
+        opns_out = height * 0
+        for direction in move:
+            max_slope = np.zeros(height.shape, dtype=np.float32) - 1000
+            for i_rad, radius in enumerate(move[direction]["distance"]):
+                _ = (np.roll(height, move[direction]["shift"][i_rad], axis=(0, 1)) - height) / radius
+                max_slope = np.fmax(max_slope, _)
+            max_slope = np.arctan(max_slope)
+            svf_out = svf_out + (1 - np.sin(np.fmax(max_slope, 0)))
+            opns_out = opns_out + max_slope
+        svf_out = svf_out[radius_max:-radius_max, radius_max:-radius_max] / num_directions
+        opns_out = np.rad2deg(0.5 * np.pi - (opns_out[radius_max:-radius_max, radius_max:-radius_max] /
+                                             num_directions))
+        result = rvt.vis.sky_view_factor_compute(height_arr=height_arr, radius_max=radius_max,
+                                                 num_directions=num_directions, compute_opns=True, workers=2)
+        self.assertEqual(result["svf"].dtype, svf_out.dtype)
+        np.testing.assert_array_equal(result["svf"], svf_out)
+        np.testing.assert_array_equal(result["opns"], opns_out)
+
+    def test_horizon_scan_prune(self):
+        """Test that horizon search with pruning equals the search without it (bit identical, also with NaN)."""
+        # noisy inclined plane (pixels are pruned) with a rough part (pruning doesn't pay off there)
+        height_arr = self.rng.normal(size=(90, 100)) * 0.5 + 0.1 * np.arange(90)[:, np.newaxis]
+        height_arr[60:, 70:] += self.rng.normal(size=(30, 30)) * 5
+        height_arr[20:25, 40:48] = np.nan
+        height_arr[0, :10] = np.nan
+        radius_max = 45
+        move = rvt.vis.horizon_shift_vector(num_directions=16, radius_pixels=radius_max)
+        for dtype in [np.float32, np.float64]:
+            height = np.pad(height_arr.astype(dtype), radius_max, mode="reflect")
+            for compute_max, compute_min in [(True, False), (False, True), (True, True)]:
+                prune = rvt.vis.horizon_prune_grid(height, radius_max, compute_max=compute_max,
+                                                   compute_min=compute_min)
+                for direction in move:
+                    slopes = []
+                    for direction_prune in [None, prune]:
+                        max_slope = np.full(height_arr.shape, -1000, dtype=dtype) if compute_max else None
+                        min_slope = np.full(height_arr.shape, 1000, dtype=dtype) if compute_min else None
+                        rvt.vis.horizon_scan(height, radius_max, move[direction]["shift"],
+                                             move[direction]["distance"], max_slope, min_slope=min_slope,
+                                             prune=direction_prune)
+                        slopes.append((max_slope, min_slope))
+                    for i_slope in range(2):
+                        if slopes[0][i_slope] is not None:
+                            np.testing.assert_array_equal(slopes[0][i_slope], slopes[1][i_slope])
+
+    def test_sky_view_factor_pyramid(self):
+        """Test that pyramid horizon search equals shift search for short radius and is close to it for long one."""
+        height_arr = (gaussian_filter(self.rng.normal(size=(140, 150)), 3) * 100 +
+                      gaussian_filter(self.rng.normal(size=(140, 150)), 30) * 3000).astype(np.float32)
+        height_arr[50:56, 70:80] = np.nan
+        keys = ["svf", "asvf", "opns", "neg_opns"]
+        for svf_r_max, svf_noise in [(20, 0), (32, 2), (120, 0)]:
+            results = [rvt.vis.sky_view_factor(height_arr, 1, compute_svf=True, compute_asvf=True,
+                                               compute_opns=True, compute_neg_opns=True, svf_r_max=svf_r_max,
+                                               svf_noise=svf_noise, search_mode=search_mode, workers=2)
+                       for search_mode in ["shift", "pyramid"]]
+            for key in keys:
+                if svf_r_max <= 32:
+                    # no coarse levels are needed up to 32 pixels
+                    np.testing.assert_array_equal(results[0][key], results[1][key])
+                    continue
+                np.testing.assert_array_equal(np.isnan(results[0][key]), np.isnan(results[1][key]))
+                error = np.abs(results[0][key] - results[1][key])
+                max_mean_error, max_error = (0.5, 5) if "opns" in key else (0.005, 0.05)
+                self.assertLess(np.nanmean(error), max_mean_error)
+                self.assertLess(np.nanmax(error), max_error)
+
+    def test_horizon_sweep(self):
+        """Test that sweep horizon search equals the search over all pixels of the digital lines (also with NaN)."""
+        height_arr = np.cumsum(self.rng.normal(size=(37, 44)), axis=0)
+        height_arr[10:13, 20:24] = np.nan
+        radius_max = 9
+        height = np.pad(height_arr, radius_max, mode="reflect")
+        rows, columns = np.indices(height_arr.shape)
+        for num_directions in [16, 7]:
+            for angle in (360 / num_directions) * np.arange(num_directions):
+                # digital line: one pixel along the main axis, rounded slope along the other (counted from the
+                # first row or column in the search direction)
+                look = np.array([-np.cos(np.radians(angle)), -np.sin(np.radians(angle))])
+                main = 0 if abs(look[0]) >= abs(look[1]) else 1
+                step = np.round(look[1 - main] / abs(look[main]), 12)
+                position = [rows, columns][main]
+                if look[main] < 0:
+                    position = height_arr.shape[main] - 1 - position
+                for radius_min in [1, 4]:
+                    expected_max = np.full(height_arr.shape, -1000.)
+                    expected_min = np.full(height_arr.shape, 1000.)
+                    for k in range(max(int(np.floor(radius_min * abs(look[main]) + 0.5)), 1),
+                                   int(np.floor(radius_max * abs(look[main]) + 0.5)) + 1):
+                        moved = [rows + radius_max, columns + radius_max]
+                        moved[main] = moved[main] + int(np.sign(look[main])) * k
+                        moved[1 - main] = moved[1 - main] + (np.floor(step * (position + k) + 0.5) -
+                                                             np.floor(step * position + 0.5)).astype(int)
+                        slope = (height[moved[0], moved[1]] - height_arr) / np.sqrt(k ** 2 + (step * k) ** 2)
+                        np.fmax(expected_max, slope, out=expected_max)
+                        np.fmin(expected_min, slope, out=expected_min)
+                    max_slope = np.full(height_arr.shape, -1000.)
+                    min_slope = np.full(height_arr.shape, 1000.)
+                    # small chunks of lines
+                    rvt.vis.horizon_sweep(height, radius_max, angle, radius_max, radius_min, max_slope, min_slope,
+                                          max_hull_size=300)
+                    np.testing.assert_allclose(max_slope, expected_max, rtol=0, atol=1e-12)
+                    np.testing.assert_allclose(min_slope, expected_min, rtol=0, atol=1e-12)
+
+    def test_sky_view_factor_sweep(self):
+        """Test that sweep horizon search equals shift search where the lines are the same as the rays."""
+        height_arr = (gaussian_filter(self.rng.normal(size=(90, 100)), 3) * 100 +
+                      gaussian_filter(self.rng.normal(size=(90, 100)), 30) * 3000).astype(np.float32)
+        height_arr[50:56, 70:80] = np.nan
+        keys = ["svf", "asvf", "opns", "neg_opns"]
+        for svf_r_max, svf_n_dir, svf_noise in [(10, 16, 0), (40, 8, 0), (40, 8, 2), (40, 16, 0)]:
+            results = [rvt.vis.sky_view_factor(height_arr, 1, compute_svf=True, compute_asvf=True,
+                                               compute_opns=True, compute_neg_opns=True, svf_r_max=svf_r_max,
+                                               svf_n_dir=svf_n_dir, svf_noise=svf_noise, search_mode=search_mode)
+                       for search_mode in ["shift", "sweep"]]
+            for key in keys:
+                if svf_r_max <= 10:
+                    # up to 10 pixels both are the same shifts
+                    np.testing.assert_array_equal(results[0][key], results[1][key])
+                elif svf_n_dir == 8:
+                    # lines along the axes and diagonals, shift computes elevation differences in float32
+                    np.testing.assert_allclose(results[0][key], results[1][key], rtol=0,
+                                               atol=1e-4 if "opns" in key else 1e-6)
+                else:
+                    # other directions, pixels of the lines are up to 1 pixel aside of the rays
+                    np.testing.assert_array_equal(np.isnan(results[0][key]), np.isnan(results[1][key]))
+                    error = np.abs(results[0][key] - results[1][key])
+                    self.assertLess(np.nanmean(error), 0.5 if "opns" in key else 0.005)
+
+    def test_shadow_horizon_resolution(self):
+        """Test that sky illumination shadow and shadow horizon scale elevation by resolution the same way."""
+        dem = (gaussian_filter(self.rng.normal(size=(80, 90)), 4) * 200).astype(np.float32)
+        for resolution in [0.5, 2]:
+            shadow = rvt.vis.shadow_horizon(dem.copy(), resolution, shadow_az=315, shadow_el=35, max_shadow_dist=20)
+            sky_shadow = rvt.vis.sky_illumination(dem.copy(), resolution, compute_shadow=True,
+                                                  shadow_horizon_only=True, max_fine_radius=20, num_directions=32,
+                                                  shadow_az=315, shadow_el=35)
+            # away from the edges (outside pixels don't cast shadows in both, but are padded differently)
+            inner = (slice(20, -20), slice(20, -20))
+            np.testing.assert_allclose(sky_shadow["horizon"][inner], shadow["horizon"][inner], rtol=0, atol=1e-3)
+            self.assertTrue(np.mean(shadow["shadow"][inner] == 0) > 0.05)  # there are some shadows
+
+    def test_read_only_dem_no_data(self):
+        """Test that visualizations accept a read-only DEM (shared DerivativeCache raster) and don't change it."""
+        dem = np.cumsum(self.rng.normal(size=(40, 50)), axis=0).astype(np.float32)
+        dem[5:8, 10:14] = -9999
+        dem.setflags(write=False)
+        dem_in = dem.copy()
+        dem_nan = np.where(dem == -9999, np.nan, dem)
+        for function, kwargs in [
+            (rvt.vis.slope_aspect, {"resolution_x": 1, "resolution_y": 1}),
+            (rvt.vis.hillshade, {"resolution_x": 1, "resolution_y": 1}),
+            (rvt.vis.multi_hillshade, {"resolution_x": 1, "resolution_y": 1, "nr_directions": 4}),
+            (rvt.vis.slrm, {"radius_cell": 10}),
+            (rvt.vis.sky_view_factor, {"resolution": 1, "svf_r_max": 5}),
+            (rvt.vis.local_dominance, {"min_rad": 2, "max_rad": 5}),
+            (rvt.vis.shadow_horizon, {"resolution": 1, "shadow_az": 315, "shadow_el": 35}),
+            (rvt.vis.mstp, {"local_scale": (1, 3, 1), "meso_scale": (4, 6, 1), "broad_scale": (7, 9, 1)}),
+        ]:
+            result = function(dem=dem, no_data=-9999, **kwargs)
+            expected = function(dem=dem_nan, **kwargs)
+            for key in (result if isinstance(result, dict) else [None]):
+                np.testing.assert_array_equal(result if key is None else result[key],
+                                              expected if key is None else expected[key])
+        np.testing.assert_array_equal(dem, dem_in)
+
+    def test_msrm_telescoping(self):
+        """Test that MSRM equals the mean of differences of all consecutive low pass filtered surfaces."""
+        dem = np.cumsum(np.cumsum(self.rng.normal(size=(120, 130)), axis=0), axis=1).astype(np.float32)
+        dem[10:14, 20:30] = np.nan
+        resolution = 0.5
+        feature_min = 1
+        feature_max = 20
+        scaling_factor = 1
+        i = int(np.floor(((feature_min - resolution) / (2 * resolution)) ** (1 / scaling_factor)))
+        n = int(np.ceil(((feature_max - resolution) / (2 * resolution)) ** (1 / scaling_factor)))
+        relief_models_sum = np.zeros(dem.shape)
+        last_lpf_surface = rvt.vis.mean_filter(dem=dem, kernel_radius=i ** scaling_factor)
+        for ndx in range(i + 1, n + 1):
+            lpf_surface = rvt.vis.mean_filter(dem=dem, kernel_radius=ndx ** scaling_factor)
+            relief_models_sum += (last_lpf_surface - lpf_surface)
+            last_lpf_surface = lpf_surface
+        expected = relief_models_sum / (n - i)
+        result = rvt.vis.msrm(dem=dem.copy(), resolution=resolution, feature_min=feature_min,
+                              feature_max=feature_max, scaling_factor=scaling_factor)
+        np.testing.assert_allclose(result, expected, rtol=1e-6, atol=1e-6)
+
+    def test_idw_fill(self):
+        """Test that IDW fill (normalized convolution on tiles) equals IDW computed pixel by pixel."""
+        dem = self.rng.normal(size=(60, 45)) * 10
+        dem[self.rng.random(dem.shape) < 0.1] = np.nan
+        dem[20:35, 10:40] = np.nan
+        radius = 4
+        power = 1.5
+        expected = np.copy(dem)
+        for i_row, i_column in zip(*np.where(np.isnan(dem))):
+            window = dem[max(i_row - radius, 0):i_row + radius + 1, max(i_column - radius, 0):i_column + radius + 1]
+            rows, columns = np.mgrid[max(i_row - radius, 0):i_row + radius + 1,
+                                     max(i_column - radius, 0):i_column + radius + 1]
+            rows, columns = rows[:window.shape[0], :window.shape[1]], columns[:window.shape[0], :window.shape[1]]
+            valid = ~np.isnan(window)
+            if not valid.any():
+                continue
+            weights = 1 / np.hypot(rows - i_row, columns - i_column)[valid] ** power
+            expected[i_row, i_column] = np.sum(window[valid] * weights) / np.sum(weights)
+        result = rvt.vis.idw_fill(dem=dem, radius=radius, power=power, tile_size=16)
+        np.testing.assert_allclose(result, expected, rtol=1e-9, atol=1e-9)
+
+    def test_fill_nan_regions(self):
+        """Test that voids are filled from their rim pixels and that voids larger than max_hole_size are skipped."""
+        dem = self.rng.normal(size=(50, 60))
+        dem[10, 10] = np.nan
+        dem[20:40, 30:55] = np.nan
+        result = rvt.vis.fill_where_nan(dem=dem, method="idw_20_1", by_region=True, max_hole_size=100)
+        rim = np.delete(dem[9:12, 9:12].ravel(), 4)
+        weights = 1 / np.array([np.sqrt(2), 1, np.sqrt(2), 1, 1, np.sqrt(2), 1, np.sqrt(2)])
+        self.assertAlmostEqual(result[10, 10], np.sum(rim * weights) / np.sum(weights))
+        self.assertTrue(np.all(np.isnan(result[20:40, 30:55])))
+        # large void is interpolated from its nearest rim pixels, equal to all rim pixels if there are few of them
+        result = rvt.vis.fill_where_nan(dem=dem, method="idw_20_1", by_region=True, max_rim_pixels=16)
+        self.assertTrue(np.nanmin(dem[19:41, 29:56]) <= result[20:40, 30:55].min())
+        self.assertTrue(result[20:40, 30:55].max() <= np.nanmax(dem[19:41, 29:56]))
+        np.testing.assert_array_equal(
+            rvt.vis.fill_where_nan(dem=dem, method="idw_20_1", by_region=True, max_rim_pixels=1000),
+            rvt.vis.fill_where_nan(dem=dem, method="idw_20_1", by_region=True, max_rim_pixels=None))
+        result = rvt.vis.fill_where_nan(dem=dem, method="nearest_neighbour", by_region=True)
+        self.assertFalse(np.any(np.isnan(result)))
+        self.assertEqual(result[30, 54], dem[30, 55])
+
+    def test_push_pull_fill(self):
+        """Test that push-pull fills all voids with averages of valid pixels and keeps valid pixels."""
+        dem = self.rng.normal(size=(70, 90))
+        dem[self.rng.random(dem.shape) < 0.3] = np.nan
+        dem[5:60, 20:70] = np.nan
+        valid = ~np.isnan(dem)
+        result = rvt.vis.fill_where_nan(dem=dem, method="push_pull")
+        self.assertFalse(np.any(np.isnan(result)))
+        np.testing.assert_array_equal(result[valid], dem[valid])
+        self.assertTrue(np.nanmin(dem) <= result.min() and result.max() <= np.nanmax(dem))
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(VisTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)